@@ -173,11 +173,11 @@ async def stream_agent(request: AgentRequest):
 @router.get("/status", response_model=AgentStatusResponse)
 async def agent_status():
     """Check agent service status."""
-    from app.services.ai.agent import PRESENTATION_TOOLS
+    from app.services.ai.agent import TOOL_NAMES
     agent = PresentationAgent()
     return AgentStatusResponse(
         available=agent.is_available,
-        tools=[t["name"] for t in PRESENTATION_TOOLS] if agent.is_available else []
+        tools=list(TOOL_NAMES) if agent.is_available else []
     )
 
 
@@ -1,10 +1,13 @@
 """AI-powered presentation generation API routes."""
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from loguru import logger
 
 from app.services.ai_service import AIService, PresentationOutline
+from app.services.ai.client import BatchError, BatchNotFoundError
+from app.services.ai.text_utils import json_dumps
 
 router = APIRouter(prefix="/ai", tags=["ai"])
 ai_service = AIService()
@@ -106,6 +109,11 @@ class SlideOperationResponse(BaseModel):
     message: str
 
 
+class SplitSlideRequest(BaseModel):
+    """Request for a streamed slide split."""
+    content: str
+
+
 class RegenerateCommentRequest(BaseModel):
     """Request for single comment regeneration."""
     slide_content: str
@@ -140,6 +148,7 @@ class GenerateImageRequest(BaseModel):
     prompt: str = Field(..., min_length=10)
     size: str = "1024x1024"
     quality: str = "standard"
+    regenerate: bool = False  # skip the image cache and generate a new image
 
 
 class GenerateImageResponse(BaseModel):
@@ -149,6 +158,13 @@ class GenerateImageResponse(BaseModel):
     message: str
 
 
+class ImageJobResponse(BaseModel):
+    """Response for a background image generation job."""
+    job_id: str
+    status: str
+    image_data: str | None = None
+
+
 class ApplyLayoutRequest(BaseModel):
     """Request for applying a specific layout."""
     content: str
@@ -200,6 +216,20 @@ class RewriteForTopicRequest(BaseModel):
     keep_style: bool = True
 
 
+class RewriteBatchRequest(BaseModel):
+    """Request for collecting a queued topic rewrite."""
+    slides: list[str]
+
+
+class RewriteBatchResponse(BaseModel):
+    """Response for a queued (batch API) topic rewrite."""
+    success: bool
+    batch_id: str | None = None
+    done: bool = False
+    slides: list[str] | None = None
+    message: str
+
+
 class LayoutInfo(BaseModel):
     """Layout class information."""
     name: str
@@ -253,6 +283,15 @@ async def generate_content(request: GenerateContentRequest) -> GenerateContentRe
     return GenerateContentResponse(success=True, content=content, message="Content generated")
 
 
+@router.post("/generate-content/stream")
+async def generate_content_stream(request: GenerateContentRequest) -> StreamingResponse:
+    """Stream presentation markdown (without comments) as batches complete."""
+    logger.info(f"Streaming content for: {request.outline.title}")
+
+    chunks = ai_service.stream_full_presentation(request.outline, request.theme, request.language)
+    return StreamingResponse(chunks, media_type="text/markdown")
+
+
 @router.post("/generate-commentary", response_model=GenerateCommentaryResponse)
 async def generate_commentary(request: GenerateCommentaryRequest) -> GenerateCommentaryResponse:
     """Generate audio-aware commentary for slides in batches."""
@@ -267,6 +306,16 @@ async def generate_commentary(request: GenerateCommentaryRequest) -> GenerateCom
     )
 
 
+@router.post("/generate-commentary/stream")
+async def generate_commentary_stream(request: GenerateCommentaryRequest) -> StreamingResponse:
+    """Stream commentary batches as NDJSON so TTS can start on early batches."""
+    logger.info(f"Streaming commentary for {len(request.slides)} slides...")
+
+    batches = ai_service.stream_commentary(request.slides, request.style)
+    lines = (json_dumps({"start": start, "comments": comments}) + b"\n" for start, comments in batches)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
+
+
 @router.post("/rewrite-slide", response_model=RewriteSlideResponse)
 async def rewrite_slide(request: RewriteSlideRequest) -> RewriteSlideResponse:
     """Rewrite slide with custom instruction."""
@@ -347,6 +396,15 @@ async def slide_operation(request: SlideOperationRequest) -> SlideOperationRespo
     return SlideOperationResponse(success=False, message=f"Unknown operation: {op}")
 
 
+@router.post("/slide-operation/split/stream")
+async def split_slide_stream(request: SplitSlideRequest) -> StreamingResponse:
+    """Stream split slides as NDJSON strings so each renders as soon as it is ready."""
+    logger.info("Streaming slide split")
+
+    slides = ai_service.stream_split_slide(request.content)
+    return StreamingResponse((json_dumps(slide) + b"\n" for slide in slides), media_type="application/x-ndjson")
+
+
 @router.post("/regenerate-comment", response_model=RegenerateCommentResponse)
 async def regenerate_comment(request: RegenerateCommentRequest) -> RegenerateCommentResponse:
     """Regenerate single slide comment."""
@@ -382,7 +440,9 @@ async def generate_image(request: GenerateImageRequest) -> GenerateImageResponse
     """Generate image using DALL-E."""
     logger.info(f"Generating image: {request.prompt[:50]}...")
 
-    image_data = ai_service.generate_image(request.prompt, request.size, request.quality)
+    image_data = ai_service.generate_image(
+        request.prompt, request.size, request.quality, use_cache=not request.regenerate
+    )
 
     if not image_data:
         return GenerateImageResponse(success=False, message="Failed to generate image")
@@ -390,6 +450,28 @@ async def generate_image(request: GenerateImageRequest) -> GenerateImageResponse
     return GenerateImageResponse(success=True, image_data=image_data, message="Image generated")
 
 
+@router.post("/generate-image/jobs", response_model=ImageJobResponse)
+async def submit_image(request: GenerateImageRequest) -> ImageJobResponse:
+    """Start image generation in the background; poll the job for the result."""
+    logger.info(f"Queueing image: {request.prompt[:50]}...")
+
+    job_id = ai_service.submit_image(
+        request.prompt, request.size, request.quality, use_cache=not request.regenerate
+    )
+    return ImageJobResponse(job_id=job_id, status="pending")
+
+
+@router.get("/generate-image/jobs/{job_id}", response_model=ImageJobResponse)
+async def get_image_job(job_id: str) -> ImageJobResponse:
+    """Get the status (and image once completed) of a background image job."""
+    job = ai_service.get_image_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    status, image_data = job
+    return ImageJobResponse(job_id=job_id, status=status, image_data=image_data)
+
+
 @router.get("/status")
 async def get_ai_status() -> dict:
     """Check AI service status."""
@@ -464,6 +546,20 @@ async def transform_style(request: TransformStyleRequest) -> TransformStyleRespo
     )
 
 
+@router.post("/rearrange-and-transform", response_model=TransformStyleResponse)
+async def rearrange_and_transform(request: TransformStyleRequest) -> TransformStyleResponse:
+    """Reorder slides for flow and transform them to a style in one pass."""
+    logger.info(f"Rearranging and transforming to {request.style} style...")
+
+    slides = ai_service.rearrange_and_transform(request.slides, request.style)
+
+    return TransformStyleResponse(
+        success=True,
+        slides=slides,
+        message=f"Rearranged and transformed to {request.style} style"
+    )
+
+
 @router.post("/rewrite-for-topic", response_model=TransformStyleResponse)
 async def rewrite_for_topic(request: RewriteForTopicRequest) -> TransformStyleResponse:
     """Rewrite entire presentation for a new topic."""
@@ -480,3 +576,38 @@ async def rewrite_for_topic(request: RewriteForTopicRequest) -> TransformStyleRe
         slides=slides,
         message=f"Rewritten for {request.new_topic}"
     )
+
+
+@router.post("/rewrite-for-topic/batch", response_model=RewriteBatchResponse)
+async def submit_rewrite_for_topic(request: RewriteForTopicRequest) -> RewriteBatchResponse:
+    """Queue a topic rewrite on the batch API (cheaper, non-interactive)."""
+    if not request.keep_style:
+        raise HTTPException(status_code=400, detail="Batch rewrites keep the original style")
+    logger.info(f"Queueing rewrite for topic: {request.new_topic}")
+
+    batch_id = ai_service.submit_topic_rewrite(request.slides, request.new_topic)
+    if not batch_id:
+        return RewriteBatchResponse(success=False, message="Failed to queue rewrite")
+
+    return RewriteBatchResponse(success=True, batch_id=batch_id, message="Rewrite queued")
+
+
+@router.post("/rewrite-for-topic/batch/{batch_id}", response_model=RewriteBatchResponse)
+async def collect_rewrite_for_topic(batch_id: str, request: RewriteBatchRequest) -> RewriteBatchResponse:
+    """Collect a queued topic rewrite, given the original slides for fallbacks."""
+    try:
+        slides = ai_service.collect_topic_rewrite(batch_id, request.slides)
+    except BatchNotFoundError:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    except BatchError:
+        return RewriteBatchResponse(success=False, batch_id=batch_id, message="Failed to collect rewrite")
+    if slides is None:
+        return RewriteBatchResponse(success=True, batch_id=batch_id, message="Rewrite still processing")
+
+    return RewriteBatchResponse(
+        success=True,
+        batch_id=batch_id,
+        done=True,
+        slides=slides,
+        message="Rewrite complete"
+    )
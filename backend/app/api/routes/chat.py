@@ -8,7 +8,7 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from loguru import logger
 
-from app.services.ai.client import AIClient
+from app.services.ai.client import get_shared_client
 from app.services.ai.models import PresentationOutline
 
 router = APIRouter(prefix="/chat", tags=["chat"])
@@ -50,7 +50,7 @@ async def generate_stream(
     current_slide: str | None,
 ) -> AsyncGenerator[str, None]:
     """Generate streaming AI response."""
-    client = AIClient()
+    client = get_shared_client()
 
     if not client.is_available:
         yield format_sse("error", {"message": "AI service not available"})
@@ -213,7 +213,7 @@ async def stream_chat(request: ChatRequest):
 @router.get("/status")
 async def chat_status():
     """Check chat service status."""
-    client = AIClient()
+    client = get_shared_client()
     return {
         "available": client.is_available,
         "streaming": True,
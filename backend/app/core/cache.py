@@ -1,12 +1,49 @@
+from typing import Any
 from cachetools import TTLCache
 import hashlib
 
+from app.core.logger import logger
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+# Cross-process AI responses live a week (slide operations are re-run often)
+SHARED_AI_CACHE_TTL = 7 * 24 * 3600
+
 def create_render_cache() -> TTLCache[str, str]:
     return TTLCache(maxsize=100, ttl=3600)
 
+def create_ai_response_cache() -> TTLCache[str, str]:
+    return TTLCache(maxsize=512, ttl=3600)
+
+def create_palette_cache() -> TTLCache[str, dict[str, Any]]:
+    return TTLCache(maxsize=128, ttl=3600)
+
+def create_shared_ai_cache(url: str | None) -> "redis.Redis | None":
+    if not url:
+        return None
+    if redis is None:
+        logger.warning("AI_CACHE_REDIS_URL is set but redis is not installed; shared AI cache disabled")
+        return None
+    return redis.Redis.from_url(url, decode_responses=True, socket_timeout=0.5)
+
 def generate_cache_key(content: str, theme_id: str | None) -> str:
     theme_str = theme_id or "default"
     combined = f"{content}{theme_str}"
     return hashlib.md5(combined.encode()).hexdigest()
 
+def generate_prompt_key(prompt: str, model: str, max_tokens: int) -> str:
+    combined = f"{model}:{max_tokens}:{prompt}"
+    return hashlib.sha256(combined.encode()).hexdigest()
+
+def generate_image_key(prompt: str, size: str, quality: str) -> str:
+    combined = f"{prompt}|{size}|{quality}"
+    return hashlib.sha256(combined.encode()).hexdigest()
+
+def generate_palette_key(base64_image: str, media_type: str, model: str) -> str:
+    combined = f"{model}|{media_type}|{base64_image}"
+    return hashlib.sha256(combined.encode()).hexdigest()
+
 render_cache: TTLCache[str, str] = create_render_cache()
@@ -1,3 +1,6 @@
+import threading
+import time
+
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 
@@ -5,3 +8,34 @@ def create_limiter() -> Limiter:
     return Limiter(key_func=get_remote_address)
 
 limiter = create_limiter()
+
+
+class TokenBucket:
+    """Thread-safe token bucket for pacing outbound requests.
+
+    Allows bursts up to ``rate`` and refills at ``rate`` per ``period``
+    seconds; ``acquire`` blocks until a token is available.
+    """
+
+    def __init__(self, rate: int, period: float = 60.0):
+        if rate < 1:
+            raise ValueError(f"Token bucket rate must be at least 1, got {rate}")
+        self.capacity = float(rate)
+        self.refill_rate = rate / period
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take one token, sleeping until the bucket refills if empty."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                elapsed = now - self._updated
+                self._tokens = min(self.capacity, self._tokens + elapsed * self.refill_rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.refill_rate
+            time.sleep(wait)
@@ -1,3 +1,4 @@
+import asyncio
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 from fastapi import FastAPI, Request
@@ -8,14 +9,25 @@ from app.api.routes import presentations, themes, tts, video_export, ai_generati
 from app.core.config import settings, config
 from app.core.logger import logger
 from app.core.rate_limiter import limiter
+from app.services.ai.client import get_shared_client
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
     from app.core.database import init_db
     logger.info("Starting Marp Builder API")
     init_db()
+    ai_client = get_shared_client()
+    warm_up: asyncio.Future[None] | None = None
+    if ai_client.is_available:
+        warm_up = asyncio.get_running_loop().run_in_executor(None, ai_client.warm_up)
     yield
     logger.info("Shutting down Marp Builder API")
+    # Warm-up runs on the shared connection pool; let it finish before closing it
+    if warm_up is not None:
+        await warm_up
+    ai_generation.ai_service.close()
+    themes.ai_service.close()
+    ai_client.close()
 
 app = FastAPI(
     title=config["app"]["name"],
@@ -1,10 +1,12 @@
 """Claude Agent SDK v2 integration for agentic presentation workflows."""
 
-import json
+import re
+from functools import lru_cache
 from typing import Iterator, Callable, Any
 from loguru import logger
 
-from .client import AIClient
+from .client import AIClient, get_shared_client
+from .text_utils import json_dumps
 
 
 # Agent tools for presentation operations
@@ -126,8 +128,11 @@ PRESENTATION_TOOLS = [
             "type": "object",
             "properties": {
                 "query": {
-                    "type": "string",
-                    "description": "Search query"
+                    "anyOf": [
+                        {"type": "string"},
+                        {"type": "array", "items": {"type": "string"}}
+                    ],
+                    "description": "Search query, or a list of queries matched in one pass"
                 }
             },
             "required": ["query"]
@@ -144,13 +149,27 @@ PRESENTATION_TOOLS = [
     }
 ]
 
+TOOL_NAMES: tuple[str, ...] = tuple(str(t["name"]) for t in PRESENTATION_TOOLS)
+
+
+@lru_cache(maxsize=128)
+def _compile_search(terms: tuple[str, ...]) -> re.Pattern[str]:
+    """Compile search terms into a single case-insensitive alternation."""
+    return re.compile("|".join(re.escape(t) for t in terms), re.IGNORECASE)
+
 
 class PresentationAgent:
     """Agentic workflow handler for presentation operations."""
 
-    def __init__(self, tool_handlers: dict[str, Callable] | None = None):
+    __slots__ = ("client", "tool_handlers", "conversation_history")
+
+    def __init__(
+        self,
+        tool_handlers: dict[str, Callable] | None = None,
+        client: AIClient | None = None
+    ):
         """Initialize the agent with optional custom tool handlers."""
-        self.client = AIClient()
+        self.client = client or get_shared_client()
         self.tool_handlers = tool_handlers or {}
         self.conversation_history: list[dict] = []
 
@@ -287,7 +306,7 @@ Current presentation context is provided below."""
                             tool_results.append({
                                 "type": "tool_result",
                                 "tool_use_id": block.id,
-                                "content": json.dumps(result)
+                                "content": json_dumps(result).decode()
                             })
 
                     # Add tool results to messages
@@ -470,17 +489,21 @@ def create_agent_tool_handlers(
         except Exception as e:
             return {"error": str(e)}
 
-    def search_presentation(query: str) -> dict:
+    def search_presentation(query: str | list[str]) -> dict:
         pres = get_presentation(presentation_id)
         if not pres:
             return {"error": "Presentation not found"}
 
+        # Empty terms would compile to a pattern matching every slide
+        terms = tuple(t for t in ((query,) if isinstance(query, str) else query) if t)
+        if not terms:
+            return {"matches": [], "count": 0}
+        pattern = _compile_search(terms)
         slides = parse_slides(pres.content)
         results = []
 
-        query_lower = query.lower()
         for i, slide in enumerate(slides):
-            if query_lower in slide.lower():
+            if pattern.search(slide):
                 results.append({
                     "slide_index": i,
                     "preview": slide[:200] + "..." if len(slide) > 200 else slide
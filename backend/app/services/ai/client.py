@@ -1,21 +1,54 @@
 """AI client initialization and base operations."""
 
 import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from functools import cache
+from importlib.util import find_spec
 from typing import Optional, Iterator
 import httpx
-from anthropic import Anthropic
+from anthropic import Anthropic, NotFoundError
+from anthropic.types.messages.batch_create_params import Request
 from loguru import logger
 
+from app.core.cache import (
+    SHARED_AI_CACHE_TTL,
+    create_ai_response_cache,
+    create_shared_ai_cache,
+    generate_prompt_key,
+)
+from app.core.rate_limiter import TokenBucket
+
+
+# HTTP/2 multiplexing needs the optional `h2` package
+HTTP2_AVAILABLE = find_spec("h2") is not None
+
+
+class BatchError(Exception):
+    """A queued batch could not be read."""
+
+
+class BatchNotFoundError(BatchError):
+    """No batch exists with the given id."""
+
 
 class AIClient:
     """Base AI client with Azure Anthropic integration."""
 
-    def __init__(self):
+    def __init__(self) -> None:
         """Initialize AI client with Azure credentials."""
         self._load_credentials()
         self._init_client()
+        self._call_slots = threading.BoundedSemaphore(self.max_concurrency)
+        # AI_MAX_RPM <= 0 disables pacing
+        self._rate_limit = TokenBucket(self.max_rpm, period=60.0) if self.max_rpm > 0 else None
+        self._response_cache = create_ai_response_cache()
+        self._cache_lock = threading.Lock()
+        self._inflight: dict[str, Future[Optional[str]]] = {}
+        self._shared_cache = create_shared_ai_cache(self.cache_redis_url)
 
-    def _load_credentials(self):
+    def _load_credentials(self) -> None:
         """Load Azure credentials from environment."""
         self.azure_endpoint = os.getenv("AZURE_ENDPOINT")
         self.api_key = os.getenv("API_KEY") or os.getenv("AZURE_API_KEY")
@@ -23,12 +56,16 @@ class AIClient:
         self.image_deployment = os.getenv("AZURE_IMAGE_DEPLOYMENT", "dall-e-3")
         self.api_version = os.getenv("AZURE_API_VERSION", "2024-05-01-preview")
         self.anthropic_version = os.getenv("ANTHROPIC_VERSION", "2023-06-01")
+        self.max_concurrency = int(os.getenv("AI_MAX_CONCURRENCY", "4"))
+        self.max_retries = int(os.getenv("AI_MAX_RETRIES", "3"))
+        self.max_rpm = int(os.getenv("AI_MAX_RPM", "500"))
+        self.cache_redis_url = os.getenv("AI_CACHE_REDIS_URL")
 
-    def _init_client(self):
+    def _init_client(self) -> None:
         """Initialize Anthropic client for Azure."""
         if not self.azure_endpoint or not self.api_key:
             logger.warning("Azure credentials not configured")
-            self.client = None
+            self.client: Optional[Anthropic] = None
             return
 
         base_url = self.azure_endpoint.rstrip("/")
@@ -36,16 +73,21 @@ class AIClient:
             "api-key": self.api_key,
             "anthropic-version": self.anthropic_version,
         }
+        # One long-lived pool: TLS handshakes are amortized across every call, and
+        # idle connections stay open for a minute between user actions
         http_client = httpx.Client(
+            http2=HTTP2_AVAILABLE,
             timeout=60.0,
             base_url=base_url,
             params={"api-version": self.api_version},
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=60),
         )
         self.client = Anthropic(
             base_url=base_url,
             api_key=self.api_key,
             default_headers=headers,
             http_client=http_client,
+            max_retries=self.max_retries,
         )
 
     @property
@@ -53,49 +95,262 @@ class AIClient:
         """Check if AI client is available."""
         return self.client is not None
 
+    def close(self) -> None:
+        """Close the pooled HTTP connections."""
+        if self.client:
+            self.client.close()
+
     def call(
         self,
         prompt: str,
         max_tokens: int = 4000,
-        context: str = "AI request"
+        context: str = "AI request",
+        use_cache: bool = True,
+        shared: bool = False
     ) -> Optional[str]:
-        """Make AI request with error handling."""
+        """Make AI request with error handling, reusing cached responses.
+
+        ``use_cache=False`` always asks the model, for operations whose re-runs
+        should produce a new answer (regenerate, restyle, rewrite). ``shared``
+        also uses the cross-process cache, for idempotent slide operations.
+        """
         if not self.client:
             logger.error(f"{context}: AI client not initialized")
             return None
+        if not use_cache:
+            return self._request(prompt, max_tokens, context)
+
+        key = generate_prompt_key(prompt, self.deployment, max_tokens)
+        cached = self._cached(key, shared)
+        if cached is not None:
+            return cached
+
+        # Single-flight: identical concurrent prompts share one request
+        with self._cache_lock:
+            cached = self._response_cache.get(key)
+            pending = self._inflight.get(key)
+            if cached is None and pending is None:
+                leader: Future[Optional[str]] = Future()
+                self._inflight[key] = leader
+        if cached is not None:
+            return cached
+        if pending is not None:
+            return pending.result()
+
+        text = None
+        try:
+            text = self._request(prompt, max_tokens, context)
+            if text:
+                with self._cache_lock:
+                    self._response_cache[key] = text
+                if shared:
+                    self._shared_set(key, text)
+        finally:
+            with self._cache_lock:
+                del self._inflight[key]
+            leader.set_result(text)
+        return text
+
+    def _cached(self, key: str, shared: bool) -> Optional[str]:
+        """Look up a response in the local cache, then (if ``shared``) the cross-process one."""
+        with self._cache_lock:
+            cached = self._response_cache.get(key)
+        if cached is None and shared:
+            cached = self._shared_get(key)
+            if cached is not None:
+                with self._cache_lock:
+                    self._response_cache[key] = cached
+        return cached
+
+    def _shared_get(self, key: str) -> Optional[str]:
+        """Look up a response in the cross-process cache, if configured."""
+        if self._shared_cache is None:
+            return None
+        try:
+            cached: Optional[str] = self._shared_cache.get(f"ai:{key}")
+            return cached
+        except Exception as e:
+            logger.warning(f"Shared AI cache read failed: {e}")
+            return None
 
+    def _shared_set(self, key: str, text: str) -> None:
+        """Store a response in the cross-process cache, if configured."""
+        if self._shared_cache is None:
+            return
         try:
-            response = self.client.messages.create(
-                model=self.deployment,
-                max_tokens=max_tokens,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            self._shared_cache.setex(f"ai:{key}", SHARED_AI_CACHE_TTL, text)
+        except Exception as e:
+            logger.warning(f"Shared AI cache write failed: {e}")
+
+    def _request(self, prompt: str, max_tokens: int, context: str) -> Optional[str]:
+        """Send a single request to the model."""
+        if self.client is None:
+            return None
+        try:
+            if self._rate_limit:
+                self._rate_limit.acquire()
+            with self._call_slots:
+                response = self.client.messages.create(
+                    model=self.deployment,
+                    max_tokens=max_tokens,
+                    messages=[{"role": "user", "content": prompt}]
+                )
             if not response.content:
                 logger.error(f"{context}: Empty response")
                 return None
-            return response.content[0].text
+            # Non-text blocks have no text; treat them like an empty reply
+            text: Optional[str] = getattr(response.content[0], "text", None)
+            return text
         except Exception as e:
             logger.error(f"{context}: {e}")
             return None
 
+    def call_many(
+        self,
+        prompts: list[str],
+        max_tokens: int | list[int] = 4000,
+        context: str = "AI request",
+        use_cache: bool = True
+    ) -> list[Optional[str]]:
+        """Make several AI requests concurrently, preserving prompt order."""
+        return list(self.call_iter(prompts, max_tokens, context, use_cache))
+
+    def call_iter(
+        self,
+        prompts: list[str],
+        max_tokens: int | list[int] = 4000,
+        context: str = "AI request",
+        use_cache: bool = True
+    ) -> Iterator[Optional[str]]:
+        """Yield concurrent AI responses in prompt order as each becomes ready.
+
+        ``max_tokens`` is either one limit for every prompt or one per prompt.
+        """
+        budgets = max_tokens if isinstance(max_tokens, list) else [max_tokens] * len(prompts)
+        if len(prompts) <= 1:
+            yield from (self.call(p, t, context, use_cache) for p, t in zip(prompts, budgets))
+            return
+
+        def run(indexed: tuple[int, str]) -> Optional[str]:
+            index, prompt = indexed
+            return self.call(prompt, budgets[index], f"{context} {index + 1}", use_cache)
+
+        workers = max(1, min(len(prompts), self.max_concurrency))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            yield from pool.map(run, enumerate(prompts))
+
+    def call_as_completed(
+        self,
+        prompts: list[str],
+        max_tokens: int | list[int] = 4000,
+        context: str = "AI request",
+        use_cache: bool = True
+    ) -> Iterator[tuple[int, Optional[str]]]:
+        """Yield ``(index, response)`` pairs in completion order."""
+        budgets = max_tokens if isinstance(max_tokens, list) else [max_tokens] * len(prompts)
+        workers = max(1, min(len(prompts), self.max_concurrency))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(self.call, prompt, budgets[index], f"{context} {index + 1}", use_cache): index
+                for index, prompt in enumerate(prompts)
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def submit_batch(
+        self,
+        prompts: list[str],
+        max_tokens: int = 4000,
+        context: str = "AI batch"
+    ) -> Optional[str]:
+        """Queue prompts on the Message Batches API (half price, results within 24h)."""
+        if not self.client:
+            logger.error(f"{context}: AI client not initialized")
+            return None
+
+        requests: list[Request] = [
+            {
+                "custom_id": str(index),
+                "params": {
+                    "model": self.deployment,
+                    "max_tokens": max_tokens,
+                    "messages": [{"role": "user", "content": prompt}],
+                },
+            }
+            for index, prompt in enumerate(prompts)
+        ]
+        try:
+            return self.client.messages.batches.create(requests=requests).id
+        except Exception as e:
+            logger.error(f"{context}: {e}")
+            return None
+
+    def fetch_batch(
+        self,
+        batch_id: str,
+        count: int,
+        context: str = "AI batch"
+    ) -> Optional[list[Optional[str]]]:
+        """Return batch responses in prompt order once the batch has ended, else None.
+
+        Raises BatchNotFoundError for an unknown id and BatchError when the
+        batch cannot be read, so callers can tell failures from "still running".
+        """
+        if not self.client:
+            raise BatchError(f"{context}: AI client not initialized")
+
+        try:
+            batch = self.client.messages.batches.retrieve(batch_id)
+            if batch.processing_status != "ended":
+                return None
+            texts: dict[str, Optional[str]] = {}
+            for entry in self.client.messages.batches.results(batch_id):
+                if entry.result.type == "succeeded" and entry.result.message.content:
+                    texts[entry.custom_id] = getattr(entry.result.message.content[0], "text", None)
+        except NotFoundError as e:
+            raise BatchNotFoundError(batch_id) from e
+        except Exception as e:
+            logger.error(f"{context}: {e}")
+            raise BatchError(str(e)) from e
+        return [texts.get(str(index)) for index in range(count)]
+
+    def warm_up(self) -> None:
+        """Prime the connection pool with a one-token request, paced like any other call."""
+        self._request(".", max_tokens=1, context="AI warm-up")
+
     def stream(
         self,
         prompt: str,
         max_tokens: int = 4000,
         context: str = "AI stream"
     ) -> Iterator[str]:
-        """Stream AI response for incremental updates."""
+        """Stream AI response for incremental updates.
+
+        The stream is paced like ``call`` but holds a call slot only while the
+        request is opened, so a slow or abandoned consumer cannot starve
+        other requests of slots.
+        """
         if not self.client:
             logger.error(f"{context}: AI client not initialized")
             return
 
         try:
-            with self.client.messages.stream(
-                model=self.deployment,
-                max_tokens=max_tokens,
-                messages=[{"role": "user", "content": prompt}]
-            ) as stream:
+            if self._rate_limit:
+                self._rate_limit.acquire()
+            with ExitStack() as stack:
+                with self._call_slots:
+                    stream = stack.enter_context(self.client.messages.stream(
+                        model=self.deployment,
+                        max_tokens=max_tokens,
+                        messages=[{"role": "user", "content": prompt}]
+                    ))
                 for text in stream.text_stream:
                     yield text
         except Exception as e:
             logger.error(f"{context}: {e}")
+
+
+@cache
+def get_shared_client() -> AIClient:
+    """Return the process-wide AI client, creating it on first use."""
+    return AIClient()
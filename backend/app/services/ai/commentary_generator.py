@@ -1,33 +1,125 @@
 """Audio-aware commentary generation for slides."""
 
+from typing import Any, Iterable, Iterator
+
 from loguru import logger
 
 from .client import AIClient
 from .text_utils import extract_json_array, format_for_audio
 
 
+BATCH_TTS_RULES = """Generate audio narration for the slides below.
+
+TTS RULES (spoken aloud):
+1. NO markdown: no **, #, `, -
+2. Expand abbreviations: "API" → "A P I"
+3. Space acronyms: "CNN" → "C N N"
+4. 2-3 sentences (40-60 words) per slide
+5. Never say: "Let's", "Here's", "This slide"
+6. Reference SPECIFIC slide content
+7. Flow naturally between slides
+
+Return JSON array:
+["Commentary for slide 1", "Commentary for slide 2", ...]"""
+
+SINGLE_TTS_RULES = """Generate audio narration for the slide below.
+
+TTS RULES:
+1. NO markdown formatting
+2. Expand abbreviations for speech
+3. 2-3 sentences (40-60 words)
+4. Never say "Let's", "Here's", "This slide"
+5. Reference SPECIFIC content
+
+Return narration text only."""
+
+
+# Characters of neighbouring slide content given as context to single comments
+CONTEXT_CHARS = 200
+
+
+def _cap(text: str, limit: int, tail: bool = False) -> str:
+    """Cap text to ``limit`` chars (its end when ``tail``), without copying short text."""
+    if len(text) <= limit:
+        return text
+    return text[-limit:] if tail else text[:limit]
+
+
 class CommentaryGenerator:
     """Generate TTS-ready commentary for slides."""
 
+    # Output budget per batch: base + per slide, capped (latency scales with tokens)
+    MAX_TOKENS = 2000
+    BASE_TOKENS = 150
+    TOKENS_PER_SLIDE = 200
+
+    # Batches are packed by estimated prompt size, up to batch_size slides
+    BATCH_INPUT_TOKENS = 12000
+    CHARS_PER_TOKEN = 4
+
     def __init__(self, client: AIClient):
         self.client = client
-        self.batch_size = 4
+        self.batch_size = 8
 
-    def generate_all(self, slides: list[dict], style: str = "professional") -> list[str]:
-        """Generate commentary for all slides in batches."""
+    def generate_all(
+        self,
+        slides: list[dict[str, Any]],
+        style: str = "professional",
+        use_cache: bool = True
+    ) -> list[str]:
+        """Generate commentary for all slides, dispatching batches concurrently.
+
+        Slides with identical content are narrated once and the comment is
+        shared by every duplicate. ``use_cache=False`` forces fresh comments.
+        """
         if not self.client.is_available:
             return ["" for _ in slides]
 
-        all_comments = []
-        total = len(slides)
+        contents = [slide.get("content", "") for slide in slides]
+        # First deck position of each distinct slide, so prompts keep deck numbering
+        positions: dict[str, int] = {}
+        for index, content in enumerate(contents):
+            positions.setdefault(content, index)
+        unique = [{"content": c} for c in positions]
+        numbers = [index + 1 for index in positions.values()]
+
+        starts, batches = self._pack(unique)
+        prompts = [
+            self._create_batch_prompt(batch, style, numbers[start:start + len(batch)])
+            for start, batch in zip(starts, batches)
+        ]
+        budgets = [self._token_budget(batch) for batch in batches]
+        responses = self.client.call_many(prompts, max_tokens=budgets, context="Commentary batch", use_cache=use_cache)
+
+        by_content: dict[str, str] = {}
+        for batch, response in zip(batches, responses):
+            comments = self._parse_batch(response, batch, style, use_cache)
+            by_content.update(zip((s["content"] for s in batch), comments))
+        return [by_content.get(c, "") for c in contents]
+
+    def iter_commentary(
+        self,
+        slides: list[dict[str, Any]],
+        style: str = "professional"
+    ) -> Iterator[tuple[int, list[str]]]:
+        """Yield ``(start_index, comments)`` per batch as soon as each batch lands.
+
+        Lets TTS synthesis start on early batches while later ones are still
+        generating. Each comment list has exactly one entry per batch slide.
+        """
+        if not self.client.is_available:
+            return
 
-        for start in range(0, total, self.batch_size):
-            end = min(start + self.batch_size, total)
-            batch = slides[start:end]
-            comments = self._generate_batch(batch, style, start, total)
-            all_comments.extend(comments)
+        starts, batches = self._pack(slides)
+        prompts = [
+            self._create_batch_prompt(batch, style, range(start + 1, start + len(batch) + 1))
+            for start, batch in zip(starts, batches)
+        ]
+        budgets = [self._token_budget(batch) for batch in batches]
+        responses = self.client.call_as_completed(prompts, max_tokens=budgets, context="Commentary batch")
 
-        return all_comments
+        for index, response in responses:
+            yield starts[index], self._parse_batch(response, batches[index], style)
 
     def generate_single(
         self,
@@ -35,7 +127,8 @@ class CommentaryGenerator:
         previous_comment: str | None = None,
         context_before: str | None = None,
         context_after: str | None = None,
-        style: str = "professional"
+        style: str = "professional",
+        use_cache: bool = True
     ) -> str:
         """Generate commentary for a single slide."""
         if not self.client.is_available:
@@ -44,78 +137,71 @@ class CommentaryGenerator:
         context = self._build_context(context_before, context_after)
         prompt = self._create_single_prompt(slide_content, context, style)
 
-        content = self.client.call(prompt, max_tokens=200, context="Single comment")
+        content = self.client.call(prompt, max_tokens=200, context="Single comment", use_cache=use_cache)
         return format_for_audio(content) if content else (previous_comment or "")
 
-    def _generate_batch(
-        self,
-        slides: list[dict],
-        style: str,
-        start_idx: int,
-        total: int
+    def _token_budget(self, slides: list[dict[str, Any]]) -> int:
+        """Scale a batch's max_tokens with its slide count."""
+        return min(self.MAX_TOKENS, self.BASE_TOKENS + self.TOKENS_PER_SLIDE * len(slides))
+
+    def _pack(self, slides: list[dict[str, Any]]) -> tuple[list[int], list[list[dict[str, Any]]]]:
+        """Greedily pack consecutive slides into batches by estimated prompt tokens."""
+        starts, batches = [], []
+        start, used = 0, 0
+        for index, slide in enumerate(slides):
+            tokens = len(slide.get("content", "")) // self.CHARS_PER_TOKEN + 1
+            full = index - start >= self.batch_size or used + tokens > self.BATCH_INPUT_TOKENS
+            if index > start and full:
+                starts.append(start)
+                batches.append(slides[start:index])
+                start, used = index, 0
+            used += tokens
+        if start < len(slides):
+            starts.append(start)
+            batches.append(slides[start:])
+        return starts, batches
+
+    def _parse_batch(
+        self, content: str | None, slides: list[dict[str, Any]], style: str, use_cache: bool = True
     ) -> list[str]:
-        """Generate commentary for a batch of slides."""
-        prompt = self._create_batch_prompt(slides, style, start_idx)
-        content = self.client.call(prompt, max_tokens=2000, context=f"Commentary batch {start_idx + 1}")
+        """Parse a batch response into one TTS-ready comment per slide.
 
+        A reply that does not parse into exactly one comment per slide is
+        redone one slide per request.
+        """
         if not content:
             return ["" for _ in slides]
 
         comments = extract_json_array(content)
-        if comments:
+        if comments and len(comments) == len(slides):
             return [format_for_audio(c) for c in comments]
 
-        return ["" for _ in slides]
+        logger.warning(f"Commentary batch returned {len(comments or [])} of {len(slides)}; retrying per slide")
+        prompts = [self._create_single_prompt(s.get("content", ""), "", style) for s in slides]
+        singles = self.client.call_many(prompts, max_tokens=200, context="Single comment", use_cache=use_cache)
+        return [format_for_audio(c) if c else "" for c in singles]
 
     def _build_context(self, before: str | None, after: str | None) -> str:
         """Build context from surrounding slides."""
         parts = []
         if before:
-            parts.append(f"Previous slide: {before[-200:]}")
+            parts.append(f"Previous slide: {_cap(before, CONTEXT_CHARS, tail=True)}")
         if after:
-            parts.append(f"Next slide: {after[:200]}")
+            parts.append(f"Next slide: {_cap(after, CONTEXT_CHARS)}")
         return "\n".join(parts)
 
-    def _create_batch_prompt(self, slides: list[dict], style: str, start_idx: int) -> str:
-        """Create batch commentary prompt."""
-        slide_block = "\n\n".join(
-            f"[Slide {start_idx + i + 1}]\n{s.get('content', '')}"
-            for i, s in enumerate(slides)
-        )
-
-        return f"""Generate audio narration for these slides.
-
-{slide_block}
-
-TTS RULES (spoken aloud):
-1. NO markdown: no **, #, `, -
-2. Expand abbreviations: "API" → "A P I"
-3. Space acronyms: "CNN" → "C N N"
-4. 2-3 sentences (40-60 words) per slide
-5. Never say: "Let's", "Here's", "This slide"
-6. Reference SPECIFIC slide content
-7. Flow naturally between slides
-
-Style: {style}
+    def _create_batch_prompt(self, slides: list[dict[str, Any]], style: str, numbers: Iterable[int]) -> str:
+        """Create batch commentary prompt (fixed rules first for prefix caching).
 
-Return JSON array:
-["Commentary for slide 1", "Commentary for slide 2", ...]"""
+        ``numbers`` are the slides' 1-based positions in the deck.
+        """
+        parts = [BATCH_TTS_RULES, f"\n\nStyle: {style}\n\nSLIDES:"]
+        separator = "\n"
+        for number, slide in zip(numbers, slides):
+            parts.append(f"{separator}[Slide {number}]\n{slide.get('content', '')}")
+            separator = "\n\n"
+        return "".join(parts)
 
     def _create_single_prompt(self, content: str, context: str, style: str) -> str:
-        """Create single slide commentary prompt."""
-        return f"""Generate audio narration for this slide.
-
-SLIDE:
-{content}
-{context}
-
-TTS RULES:
-1. NO markdown formatting
-2. Expand abbreviations for speech
-3. 2-3 sentences (40-60 words)
-4. Never say "Let's", "Here's", "This slide"
-5. Reference SPECIFIC content
-
-Style: {style}
-
-Return narration text only."""
+        """Create single slide commentary prompt (fixed rules first for prefix caching)."""
+        return f"{SINGLE_TTS_RULES}\n\nStyle: {style}\n\nSLIDE:\n{content}\n{context}"
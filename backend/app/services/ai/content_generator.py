@@ -1,10 +1,16 @@
 """Slide content generation with batching and viewport awareness."""
 
+from io import StringIO
+from typing import Iterator
+
 from .client import AIClient
 from .models import SlideOutline, PresentationOutline
 from .text_utils import sanitize_markdown, fix_broken_comments, parse_slide_blocks
 
 
+SLIDE_SEPARATOR = "\n\n---\n\n"
+
+
 class ContentGenerator:
     """Generate slide content without comments (comments generated separately)."""
 
@@ -13,6 +19,28 @@ class ContentGenerator:
     MAX_CHAR_PER_BULLET = 80
     MAX_LINES = 12
 
+    # Output budget per batch: base + per slide, capped (latency scales with tokens)
+    MAX_TOKENS = 2500
+    BASE_TOKENS = 400
+    TOKENS_PER_SLIDE = 250
+
+    # Fixed instructions lead the prompt so provider prefix caches can hit
+    PROMPT_RULES = f"""Create Marp slides.
+
+RULES:
+- Separate with ---
+- Descriptive titles (never "Slide 1")
+- 3-5 bullets, concise
+- Vary layouts: bullets, lists, quotes
+- NO HTML comments (narration added separately)
+
+VIEWPORT (must fit on screen):
+- Max {MAX_BULLETS} bullets
+- Max {MAX_CHAR_PER_BULLET} chars per bullet
+- Split if too long
+
+Return markdown only, no code fences."""
+
     def __init__(self, client: AIClient):
         self.client = client
         self.batch_size = 4
@@ -24,24 +52,33 @@ class ContentGenerator:
         language: str | None = None
     ) -> str:
         """Generate full presentation content without comments."""
-        frontmatter = self._build_frontmatter(outline.title)
-        full_context = self._build_context(outline)
+        return "".join(self.generate_stream(outline, theme, language))
 
-        blocks = [self._create_intro(outline.title)]
-
-        # Generate in batches
-        slides = outline.slides
-        total_batches = max(1, (len(slides) + self.batch_size - 1) // self.batch_size)
-
-        for i in range(total_batches):
-            start = i * self.batch_size
-            end = start + self.batch_size
-            batch = slides[start:end]
-            batch_blocks = self._generate_batch(batch, theme, i + 1, total_batches, full_context, language)
-            blocks.extend(batch_blocks)
+    def generate_stream(
+        self,
+        outline: PresentationOutline,
+        theme: str = "professional",
+        language: str | None = None
+    ) -> Iterator[str]:
+        """Yield presentation markdown in slide order as batches complete."""
+        full_context = self._build_context(outline)
 
-        blocks.append(self._create_outro(outline.title))
-        return frontmatter + "\n\n---\n\n".join(blocks)
+        # Generate all batches concurrently
+        batches = self._split_batches(outline.slides)
+        total_batches = len(batches)
+        prompts = [
+            self._create_prompt(batch, theme, i + 1, total_batches, full_context, language)
+            for i, batch in enumerate(batches)
+        ]
+
+        yield self._build_frontmatter(outline.title)
+        yield self._create_intro(outline.title)
+        budgets = [self._token_budget(batch) for batch in batches]
+        contents = self.client.call_iter(prompts, max_tokens=budgets, context="Content batch")
+        for batch, content in zip(batches, contents):
+            for block in self._parse_batch(content, batch):
+                yield SLIDE_SEPARATOR + block
+        yield SLIDE_SEPARATOR + self._create_outro(outline.title)
 
     def _build_frontmatter(self, title: str) -> str:
         """Build Marp frontmatter."""
@@ -69,19 +106,27 @@ paginate: true
         """Create closing slide."""
         return f"# Thank You\n\n**{title}**\n\nQuestions? Let's discuss."
 
-    def _generate_batch(
-        self,
-        slides: list[SlideOutline],
-        theme: str,
-        batch_idx: int,
-        total_batches: int,
-        full_context: str,
-        language: str | None = None
-    ) -> list[str]:
-        """Generate content for a batch of slides."""
-        prompt = self._create_prompt(slides, theme, batch_idx, total_batches, full_context, language)
-        content = self.client.call(prompt, max_tokens=2500, context=f"Content batch {batch_idx}")
+    def _split_batches(self, slides: list[SlideOutline]) -> list[list[SlideOutline]]:
+        """Split slides into the fewest batches of at most batch_size, evenly sized.
 
+        Batches run concurrently, so the largest one sets the latency: 6 slides
+        go out as 3 + 3 rather than 4 + 2.
+        """
+        total_batches = max(1, -(-len(slides) // self.batch_size))
+        size, extra = divmod(len(slides), total_batches)
+        batches, start = [], 0
+        for i in range(total_batches):
+            end = start + size + (i < extra)
+            batches.append(slides[start:end])
+            start = end
+        return batches
+
+    def _token_budget(self, slides: list[SlideOutline]) -> int:
+        """Scale a batch's max_tokens with its slide count."""
+        return min(self.MAX_TOKENS, self.BASE_TOKENS + self.TOKENS_PER_SLIDE * len(slides))
+
+    def _parse_batch(self, content: str | None, slides: list[SlideOutline]) -> list[str]:
+        """Parse a batch response into slide blocks, falling back on failure."""
         if not content:
             return self._create_fallback(slides)
 
@@ -99,38 +144,24 @@ paginate: true
         language: str | None = None
     ) -> str:
         """Create content generation prompt."""
-        slide_block = "\n\n".join(
-            f"Slide {i+1}: {s.title}\nPoints: {', '.join(s.content_points)}"
-            for i, s in enumerate(slides)
-        )
-
-        lang_instruction = ""
+        buf = StringIO()
+        buf.write(self.PROMPT_RULES)
+        buf.write(f"\n\nBatch {batch_idx}/{total_batches}. Theme: {theme}")
         if language and language.lower() != "english":
-            lang_instruction = f"\n- LANGUAGE: Write ALL content in {language}"
-
-        return f"""Create Marp slides. Batch {batch_idx}/{total_batches}.
-
-Theme: {theme}
-
-CONTEXT (full presentation):
-{full_context}
-
-GENERATE THESE SLIDES:
-{slide_block}
-
-RULES:
-- Separate with ---
-- Descriptive titles (never "Slide 1")
-- 3-5 bullets, concise
-- Vary layouts: bullets, lists, quotes
-- NO HTML comments (narration added separately){lang_instruction}
-
-VIEWPORT (must fit on screen):
-- Max {self.MAX_BULLETS} bullets
-- Max {self.MAX_CHAR_PER_BULLET} chars per bullet
-- Split if too long
-
-Return markdown only, no code fences."""
+            buf.write(f"\nLANGUAGE: Write ALL content in {language}")
+        buf.write(f"\n\nCONTEXT (full presentation):\n{full_context}\n\nGENERATE THESE SLIDES:")
+
+        separator = "\n"
+        for number, slide in enumerate(slides, start=1):
+            buf.write(separator)
+            buf.write("Slide ")
+            buf.write(str(number))
+            buf.write(": ")
+            buf.write(slide.title)
+            buf.write("\nPoints: ")
+            buf.write(", ".join(slide.content_points))
+            separator = "\n\n"
+        return buf.getvalue()
 
     def _create_fallback(self, slides: list[SlideOutline]) -> list[str]:
         """Create fallback content when AI fails."""
@@ -1,18 +1,54 @@
 """Image generation using DALL-E via Azure."""
 
 import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
 from typing import Optional
 import httpx
+from cachetools import TTLCache
 from loguru import logger
 
+from app.core.cache import generate_image_key
+from .client import HTTP2_AVAILABLE
+
+
+try:
+    import pybase64 as b64  # SIMD-accelerated codec for the disk cache when installed
+except ImportError:
+    import base64 as b64
+
 
 class ImageGenerator:
     """Generate images using DALL-E."""
 
-    def __init__(self, azure_endpoint: str, api_key: str, deployment: str):
+    # Background generations run concurrently; finished jobs are kept for an hour
+    JOB_WORKERS = 4
+    JOB_TTL = 3600
+
+    # Generated images are reused for identical (prompt, size, quality) for 30 days;
+    # expired files are swept whenever a new image is written
+    CACHE_TTL = 30 * 24 * 3600
+
+    def __init__(
+        self,
+        azure_endpoint: str,
+        api_key: str,
+        deployment: str,
+        cache_dir: Path | None = None
+    ):
         self.azure_endpoint = azure_endpoint
         self.api_key = api_key
         self.deployment = deployment
+        self.cache_dir = cache_dir
+        self._client: httpx.Client | None = None
+        self._client_lock = threading.Lock()
+        self._executor: ThreadPoolExecutor | None = None
+        self._executor_lock = threading.Lock()
+        self._jobs: TTLCache[str, Future] = TTLCache(maxsize=256, ttl=self.JOB_TTL)
+        self._jobs_lock = threading.Lock()
 
     @property
     def is_available(self) -> bool:
@@ -23,28 +59,144 @@ class ImageGenerator:
         self,
         prompt: str,
         size: str = "1024x1024",
-        quality: str = "standard"
+        quality: str = "standard",
+        use_cache: bool = True
     ) -> Optional[str]:
-        """Generate image and return base64 data."""
+        """Generate image and return base64 data.
+
+        DALL-E takes no seed, so ``use_cache=False`` is the only way to get a
+        new image for the same prompt; the new image replaces the cached one.
+        """
         if not self.is_available:
             logger.error("Azure credentials not configured")
             return None
 
+        cache_path = self._cache_path(prompt, size, quality)
+        cached = self._read_cache(cache_path) if use_cache else None
+        if cached:
+            return cached
+
         try:
             url = self._build_url()
             headers = {"api-key": self.api_key, "Content-Type": "application/json"}
             payload = self._build_payload(prompt, size, quality)
 
-            with httpx.Client(timeout=60.0) as client:
-                response = client.post(url, headers=headers, params=self._params(), json=payload)
-                response.raise_for_status()
-
-            return self._extract_image(response.json())
+            response = self._http().post(url, headers=headers, params=self._params(), json=payload)
+            response.raise_for_status()
 
+            image = self._extract_image(response.json())
         except Exception as e:
             logger.error(f"Image generation failed: {e}")
             return None
 
+        if image:
+            self._write_cache(cache_path, image)
+        return image
+
+    def submit(
+        self,
+        prompt: str,
+        size: str = "1024x1024",
+        quality: str = "standard",
+        use_cache: bool = True
+    ) -> str:
+        """Start generating an image in the background and return its job id."""
+        job_id = uuid.uuid4().hex[:8]
+        future = self._pool().submit(self.generate, prompt, size, quality, use_cache)
+        with self._jobs_lock:
+            self._jobs[job_id] = future
+        return job_id
+
+    def close(self) -> None:
+        """Cancel queued image jobs and close the pooled HTTP connections."""
+        with self._executor_lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+        with self._client_lock:
+            if self._client is not None:
+                self._client.close()
+                self._client = None
+
+    def get_job(self, job_id: str) -> Optional[tuple[str, Optional[str]]]:
+        """Return ``(status, image_data)`` for a job, or None if unknown or expired.
+
+        Status is "pending", "completed" or "failed".
+        """
+        with self._jobs_lock:
+            future = self._jobs.get(job_id)
+        if future is None:
+            return None
+        if not future.done():
+            return "pending", None
+        # Jobs still queued when close() ran are cancelled, never completed
+        if future.cancelled():
+            return "failed", None
+        image = future.result()
+        return ("completed", image) if image else ("failed", None)
+
+    def _cache_path(self, prompt: str, size: str, quality: str) -> Path | None:
+        """Return the on-disk cache file for a request, if caching is enabled."""
+        if self.cache_dir is None:
+            return None
+        return self.cache_dir / f"{generate_image_key(prompt, size, quality)}.png"
+
+    def _read_cache(self, path: Path | None) -> Optional[str]:
+        """Return a fresh cached image as base64, if present; an expired one is deleted."""
+        try:
+            if path is None:
+                return None
+            if self._expired(path):
+                path.unlink(missing_ok=True)
+                return None
+            return b64.b64encode(path.read_bytes()).decode()
+        except OSError:
+            return None
+
+    def _write_cache(self, path: Path | None, image: str) -> None:
+        """Store a generated image and sweep expired ones; cache failures never fail generation."""
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b64.b64decode(image))
+            self._prune_cache(path.parent)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Image cache write failed: {e}")
+
+    def _prune_cache(self, directory: Path) -> None:
+        """Delete cached images older than CACHE_TTL."""
+        for cached in directory.glob("*.png"):
+            try:
+                if self._expired(cached):
+                    cached.unlink(missing_ok=True)
+            except OSError:
+                continue
+
+    def _expired(self, path: Path) -> bool:
+        """Check whether a cache file is older than CACHE_TTL (raises if it is gone)."""
+        return time.time() - path.stat().st_mtime > self.CACHE_TTL
+
+    def _pool(self) -> ThreadPoolExecutor:
+        """Return the job pool, creating it once on first submit (request threads race here)."""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.JOB_WORKERS, thread_name_prefix="image")
+        return self._executor
+
+    def _http(self) -> httpx.Client:
+        """Return the pooled HTTP client, creating it once on first use (job threads race here)."""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = httpx.Client(
+                        http2=HTTP2_AVAILABLE,
+                        timeout=60.0,
+                        limits=httpx.Limits(max_connections=16, max_keepalive_connections=8, keepalive_expiry=60),
+                    )
+        return self._client
+
     def _build_url(self) -> str:
         """Build DALL-E API URL."""
         base = self.azure_endpoint.rstrip("/").removesuffix("/anthropic")
@@ -1,5 +1,9 @@
 """Layout CSS classes and HTML patterns for Marp slides."""
 
+from collections.abc import Mapping
+from functools import cache
+from types import MappingProxyType
+
 LAYOUT_CLASSES = {
     "columns-2": {
         "name": "Two Columns",
@@ -163,16 +167,20 @@ CALLOUT_CLASSES = {
 }
 
 
+def _describe(classes: dict) -> str:
+    """Render class names and descriptions as a bullet list."""
+    return "\n".join(f"- `{k}`: {v['description']}" for k, v in classes.items())
+
+
+_LAYOUT_LIST = _describe(LAYOUT_CLASSES)
+_CALLOUT_LIST = _describe(CALLOUT_CLASSES)
+
+
+@cache
 def get_layout_prompt() -> str:
     """Generate layout guidance for AI content generation."""
-    layouts = "\n".join([
-        f"- `{k}`: {v['description']}"
-        for k, v in LAYOUT_CLASSES.items()
-    ])
-    callouts = "\n".join([
-        f"- `{k}`: {v['description']}"
-        for k, v in CALLOUT_CLASSES.items()
-    ])
+    layouts = _LAYOUT_LIST
+    callouts = _CALLOUT_LIST
     return f"""Available CSS layout classes (wrap content in <div class="...">):
 
 LAYOUTS:
@@ -195,10 +203,13 @@ DIAGRAM_CLASSES = {
 }
 
 
-def get_all_layouts() -> dict:
-    """Return all layouts, diagrams, and callouts for frontend."""
-    return {
-        "layouts": {k: v for k, v in LAYOUT_CLASSES.items() if k not in DIAGRAM_CLASSES},
-        "diagrams": DIAGRAM_CLASSES,
-        "callouts": CALLOUT_CLASSES,
-    }
+ALL_LAYOUTS: Mapping[str, Mapping[str, dict]] = MappingProxyType({
+    "layouts": MappingProxyType({k: v for k, v in LAYOUT_CLASSES.items() if k not in DIAGRAM_CLASSES}),
+    "diagrams": MappingProxyType(DIAGRAM_CLASSES),
+    "callouts": MappingProxyType(CALLOUT_CLASSES),
+})
+
+
+def get_all_layouts() -> Mapping[str, Mapping[str, dict]]:
+    """Return all layouts, diagrams, and callouts for frontend (read-only view)."""
+    return ALL_LAYOUTS
@@ -1,11 +1,57 @@
 """Outline generation with batching for large presentations."""
 
-from typing import Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Optional
 from loguru import logger
+from pydantic import TypeAdapter, ValidationError
 
 from .client import AIClient
 from .models import SlideOutline, PresentationOutline
-from .text_utils import extract_json
+from .text_utils import extract_json, scan_array_objects
+
+
+# Validates a whole section's slides in one pydantic-core pass
+SLIDE_LIST_ADAPTER = TypeAdapter(list[SlideOutline])
+
+# Prompt templates, filled with str.format_map
+OUTLINE_PROMPT = """Create a presentation outline.
+
+Topic: {description}
+{context}
+
+Constraints:
+{constraints}
+
+Generate:
+1. A compelling title
+2. {slide_hint} with clear, specific titles
+
+Return JSON only:
+{{
+    "title": "Presentation Title",
+    "slides": [
+        {{"title": "Descriptive Title", "content_points": ["Point 1", "Point 2"], "notes": ""}}
+    ]
+}}
+
+Rules:
+- 3-5 focused points per slide
+- Descriptive titles (never "Slide 1")
+- No audio notes (generated separately)"""
+
+STRUCTURE_PROMPT = """Create structure for a {target}-slide presentation.
+
+Topic: {description}
+
+Return JSON:
+{{
+    "title": "Presentation Title",
+    "sections": [
+        {{"name": "Section Name", "slide_count": 3, "topics": ["topic1", "topic2"]}}
+    ]
+}}
+
+Divide into 3-5 logical sections."""
 
 
 class OutlineGenerator:
@@ -58,30 +104,12 @@ class OutlineGenerator:
 
     def _create_prompt(self, description: str, constraints: str, slide_hint: str, context: str = "") -> str:
         """Create outline generation prompt."""
-        return f"""Create a presentation outline.
-
-Topic: {description}
-{context}
-
-Constraints:
-{constraints}
-
-Generate:
-1. A compelling title
-2. {slide_hint} with clear, specific titles
-
-Return JSON only:
-{{
-    "title": "Presentation Title",
-    "slides": [
-        {{"title": "Descriptive Title", "content_points": ["Point 1", "Point 2"], "notes": ""}}
-    ]
-}}
-
-Rules:
-- 3-5 focused points per slide
-- Descriptive titles (never "Slide 1")
-- No audio notes (generated separately)"""
+        return OUTLINE_PROMPT.format_map({
+            "description": description,
+            "context": context,
+            "constraints": constraints,
+            "slide_hint": slide_hint,
+        })
 
     def _generate_single(
         self,
@@ -102,7 +130,11 @@ Rules:
         if not data:
             return None
 
-        outline = PresentationOutline(**data)
+        try:
+            outline = PresentationOutline.model_validate(data)
+        except ValidationError as e:
+            logger.error(f"Invalid outline: {e}")
+            return None
         outline.narration_instructions = narration_instructions
         outline.comment_max_ratio = comment_max_ratio
         return outline
@@ -114,20 +146,45 @@ Rules:
         constraints: str,
         narration_instructions: Optional[str]
     ) -> Optional[PresentationOutline]:
-        """Generate outline in batches for large presentations."""
-        # First: get high-level structure
-        structure = self._generate_structure(description, target)
-        if not structure:
-            return None
+        """Generate outline in batches for large presentations.
+
+        The structure is streamed and each section's slide request is
+        dispatched as soon as that section's JSON object closes, so the
+        first batches overlap with the rest of the structure response.
+        """
+        with ThreadPoolExecutor(max_workers=self.client.max_concurrency) as pool:
+            def dispatch(section: dict[str, Any]) -> Future[Optional[str]]:
+                prompt = self._create_section_prompt(description, section, constraints)
+                return pool.submit(self.client.call, prompt, 2000, "Outline section")
+
+            structure_prompt = self._create_structure_prompt(description, target)
+            text, pos = "", 0
+            futures: list[Future[Optional[str]]] = []
+            for chunk in self.client.stream(structure_prompt, max_tokens=1500, context="Generate structure"):
+                text += chunk
+                sections, pos = scan_array_objects(text, "sections", pos)
+                futures.extend(dispatch(s) for s in sections)
+
+            structure = extract_json(text) if text else None
+            if not structure:
+                # Streaming unavailable or the streamed JSON did not parse: sections
+                # dispatched so far may not match the retried structure. Queued ones
+                # are cancelled; running ones cannot be stopped, so their replies are
+                # discarded (the pool still waits for them on exit)
+                stale, futures = futures, []
+                for future in stale:
+                    future.cancel()
+                structure = self._generate_structure(description, target)
+            if not structure:
+                return None
+
+            title = structure.get("title", "Presentation")
+            futures.extend(dispatch(s) for s in structure.get("sections", [])[len(futures):])
+            contents = [f.result() for f in futures]
 
-        title = structure.get("title", "Presentation")
-        sections = structure.get("sections", [])
-
-        # Generate slides for each section
         all_slides = []
-        for section in sections:
-            slides = self._generate_section_slides(description, section, constraints)
-            all_slides.extend(slides)
+        for content in contents:
+            all_slides.extend(self._parse_section_slides(content))
 
         if not all_slides:
             return None
@@ -138,42 +195,33 @@ Rules:
             narration_instructions=narration_instructions
         )
 
+    def _create_structure_prompt(self, description: str, target: int) -> str:
+        """Create the high-level section structure prompt."""
+        return STRUCTURE_PROMPT.format_map({"target": target, "description": description})
+
     def _generate_structure(self, description: str, target: int) -> Optional[dict]:
         """Generate high-level section structure."""
-        prompt = f"""Create structure for a {target}-slide presentation.
-
-Topic: {description}
-
-Return JSON:
-{{
-    "title": "Presentation Title",
-    "sections": [
-        {{"name": "Section Name", "slide_count": 3, "topics": ["topic1", "topic2"]}}
-    ]
-}}
-
-Divide into 3-5 logical sections."""
-
+        prompt = self._create_structure_prompt(description, target)
         content = self.client.call(prompt, max_tokens=1500, context="Generate structure")
         return extract_json(content) if content else None
 
-    def _generate_section_slides(
-        self,
-        description: str,
-        section: dict,
-        constraints: str
-    ) -> list[SlideOutline]:
-        """Generate slides for a section."""
+    def _create_section_prompt(self, description: str, section: dict, constraints: str) -> str:
+        """Create the slide prompt for a single section."""
         section_name = section.get("name", "Section")
         slide_count = section.get("slide_count", 3)
         topics = ", ".join(section.get("topics", []))
 
         context = f"Section: {section_name}\nTopics: {topics}"
-        prompt = self._create_prompt(description, constraints, f"{slide_count} slides", context)
+        return self._create_prompt(description, constraints, f"{slide_count} slides", context)
 
-        content = self.client.call(prompt, max_tokens=2000, context=f"Section: {section_name}")
+    def _parse_section_slides(self, content: Optional[str]) -> list[SlideOutline]:
+        """Parse a section response into slide outlines."""
         data = extract_json(content) if content else None
 
-        if data and "slides" in data:
-            return [SlideOutline(**s) for s in data["slides"]]
-        return []
+        if not data or "slides" not in data:
+            return []
+        try:
+            return SLIDE_LIST_ADAPTER.validate_python(data["slides"])
+        except ValidationError as e:
+            logger.error(f"Invalid section slides: {e}")
+            return []
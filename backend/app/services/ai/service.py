@@ -1,8 +1,12 @@
 """Main AI service composing all generators."""
 
-from typing import Optional
+from collections.abc import Mapping
+from functools import cached_property
+from typing import Iterator, Optional
 
-from .client import AIClient
+from app.core.config import BASE_DIR
+
+from .client import AIClient, get_shared_client
 from .models import PresentationOutline
 from .outline_generator import OutlineGenerator
 from .content_generator import ContentGenerator
@@ -13,29 +17,59 @@ from .theme_generator import ThemeGenerator
 from .layout_guide import get_all_layouts
 
 
+IMAGE_CACHE_DIR = BASE_DIR / "data" / "image_cache"
+
+
 class AIService:
     """Unified AI service for presentation generation."""
 
-    def __init__(self):
-        """Initialize all AI components."""
-        self.client = AIClient()
-        self._outline = OutlineGenerator(self.client)
-        self._content = ContentGenerator(self.client)
-        self._commentary = CommentaryGenerator(self.client)
-        self._slides = SlideOperations(self.client)
-        self._transformer = PresentationTransformer(self.client)
-        self._images = ImageGenerator(
+    def __init__(self, client: AIClient | None = None):
+        """Initialize around a shared client; components are built on first use."""
+        self.client = client or get_shared_client()
+
+    @cached_property
+    def _outline(self) -> OutlineGenerator:
+        return OutlineGenerator(self.client)
+
+    @cached_property
+    def _content(self) -> ContentGenerator:
+        return ContentGenerator(self.client)
+
+    @cached_property
+    def _commentary(self) -> CommentaryGenerator:
+        return CommentaryGenerator(self.client)
+
+    @cached_property
+    def _slides(self) -> SlideOperations:
+        return SlideOperations(self.client)
+
+    @cached_property
+    def _transformer(self) -> PresentationTransformer:
+        return PresentationTransformer(self.client)
+
+    @cached_property
+    def _images(self) -> ImageGenerator:
+        return ImageGenerator(
             self.client.azure_endpoint or "",
             self.client.api_key or "",
-            self.client.image_deployment
+            self.client.image_deployment,
+            cache_dir=IMAGE_CACHE_DIR
         )
-        self._themes = ThemeGenerator(self.client)
+
+    @cached_property
+    def _themes(self) -> ThemeGenerator:
+        return ThemeGenerator(self.client)
 
     @property
     def is_available(self) -> bool:
         """Check if AI is available."""
         return self.client.is_available
 
+    def close(self) -> None:
+        """Release resources this service owns; the shared client is closed separately."""
+        if "_images" in self.__dict__:
+            self._images.close()
+
     # -------------------------------------------------------------------------
     # Outline Generation
     # -------------------------------------------------------------------------
@@ -70,6 +104,15 @@ class AIService:
         """Generate full presentation without comments."""
         return self._content.generate(outline, theme, language)
 
+    def stream_full_presentation(
+        self,
+        outline: PresentationOutline,
+        theme: str = "professional",
+        language: Optional[str] = None
+    ) -> Iterator[str]:
+        """Stream presentation markdown chunks as batches complete."""
+        return self._content.generate_stream(outline, theme, language)
+
     # -------------------------------------------------------------------------
     # Commentary Generation
     # -------------------------------------------------------------------------
@@ -82,6 +125,14 @@ class AIService:
         """Generate audio-aware commentary for all slides."""
         return self._commentary.generate_all(slides, style)
 
+    def stream_commentary(
+        self,
+        slides: list[dict],
+        style: str = "professional"
+    ) -> Iterator[tuple[int, list[str]]]:
+        """Stream ``(start_index, comments)`` batches as each completes."""
+        return self._commentary.iter_commentary(slides, style)
+
     def regenerate_comment(
         self,
         slide_content: str,
@@ -90,9 +141,9 @@ class AIService:
         context_after: str | None = None,
         style: str = "professional"
     ) -> str:
-        """Regenerate single slide commentary."""
+        """Regenerate single slide commentary, bypassing the response cache."""
         return self._commentary.generate_single(
-            slide_content, previous_comment, context_before, context_after, style
+            slide_content, previous_comment, context_before, context_after, style, use_cache=False
         )
 
     def regenerate_all_comments(
@@ -100,8 +151,8 @@ class AIService:
         slides: list[dict],
         style: str = "professional"
     ) -> list[str]:
-        """Regenerate all comments."""
-        return self._commentary.generate_all(slides, style)
+        """Regenerate all comments, bypassing the response cache."""
+        return self._commentary.generate_all(slides, style, use_cache=False)
 
     # -------------------------------------------------------------------------
     # Slide Operations
@@ -144,6 +195,10 @@ class AIService:
         """Split overloaded slide."""
         return self._slides.split(content)
 
+    def stream_split_slide(self, content: str) -> Iterator[str]:
+        """Stream the slides of a split as each is generated."""
+        return self._slides.split_stream(content)
+
     def apply_layout(self, content: str, layout_type: str) -> str:
         """Apply a specific layout to slide content."""
         return self._slides.apply_layout(content, layout_type)
@@ -164,17 +219,29 @@ class AIService:
         """Transform presentation to a specific style."""
         return self._transformer.transform_style(slides, style)
 
+    def rearrange_and_transform(self, slides: list[str], style: str) -> list[str]:
+        """Reorder and restyle a presentation in one pass."""
+        return self._transformer.rearrange_and_transform(slides, style)
+
     def rewrite_for_topic(
         self, slides: list[str], new_topic: str, keep_style: bool = True
     ) -> list[str]:
         """Rewrite entire presentation for a new topic."""
         return self._transformer.rewrite_for_topic(slides, new_topic, keep_style)
 
+    def submit_topic_rewrite(self, slides: list[str], new_topic: str) -> Optional[str]:
+        """Queue a topic rewrite on the batch API and return its batch id."""
+        return self._transformer.submit_topic_rewrite(slides, new_topic)
+
+    def collect_topic_rewrite(self, batch_id: str, slides: list[str]) -> Optional[list[str]]:
+        """Fetch a queued topic rewrite; None while it is still processing, BatchError on failure."""
+        return self._transformer.collect_topic_rewrite(batch_id, slides)
+
     # -------------------------------------------------------------------------
     # Layout Information
     # -------------------------------------------------------------------------
 
-    def get_layouts(self) -> dict:
+    def get_layouts(self) -> Mapping[str, Mapping[str, dict]]:
         """Get available layout classes and callouts."""
         return get_all_layouts()
 
@@ -186,10 +253,25 @@ class AIService:
         self,
         prompt: str,
         size: str = "1024x1024",
-        quality: str = "standard"
+        quality: str = "standard",
+        use_cache: bool = True
     ) -> Optional[str]:
-        """Generate image using DALL-E."""
-        return self._images.generate(prompt, size, quality)
+        """Generate image using DALL-E; ``use_cache=False`` forces a new image."""
+        return self._images.generate(prompt, size, quality, use_cache)
+
+    def submit_image(
+        self,
+        prompt: str,
+        size: str = "1024x1024",
+        quality: str = "standard",
+        use_cache: bool = True
+    ) -> str:
+        """Start a background image generation and return its job id."""
+        return self._images.submit(prompt, size, quality, use_cache)
+
+    def get_image_job(self, job_id: str) -> Optional[tuple[str, Optional[str]]]:
+        """Get ``(status, image_data)`` for a background image job."""
+        return self._images.get_job(job_id)
 
     # -------------------------------------------------------------------------
     # Theme Generation
@@ -1,47 +1,103 @@
 """Slide rewriting and transformation operations."""
 
+import re
+from typing import Iterator
+
+from loguru import logger
+
 from .client import AIClient
-from .text_utils import sanitize_markdown, parse_slide_blocks
+from .text_utils import extract_json, sanitize_markdown, parse_slide_blocks, iter_slide_blocks
 from .layout_guide import get_layout_prompt, LAYOUT_CLASSES
 
 
+# Layout/diagram classes whose HTML must stay on one slide, matched in a single pass
+DIAGRAM_CLASSES = (
+    "flow-horizontal", "flow-vertical", "hierarchy", "cycle",
+    "pyramid", "stat-cards", "timeline", "columns-", "feature-grid",
+    "pros-cons", "comparison",
+)
+DIAGRAM_CLASS_PATTERN = re.compile("|".join(map(re.escape, DIAGRAM_CLASSES)))
+
+# Static layout guide, rendered once and brace-escaped for the format_map templates
+LAYOUT_GUIDE = get_layout_prompt().replace("{", "{{").replace("}", "}}")
+
+# Delimits slides packed into a single request and its reply
+SLIDE_SENTINEL = "===SLIDE==="
+
+# Markdown list items: "- ", "* ", "+ " or "1. "
+BULLET_PATTERN = re.compile(r"^\s*(?:[-*+]|\d+\.)\s+")
+
+
+def _split_marshaled(result: str, expected: int) -> list[str] | None:
+    """Split a packed reply into sanitized slides, or None if the count is off."""
+    # Unwrapping the whole reply only drops a fence around every slide; each
+    # slide is then sanitized on its own, as single-slide replies are
+    parts = sanitize_markdown(result).split(SLIDE_SENTINEL)
+    blocks = [sanitize_markdown(part) for part in (parts[1:] if len(parts) > 1 else parts)]
+    if len(blocks) != expected or not all(blocks):
+        return None
+    return blocks
+
+
+def _slide_stats(content: str) -> tuple[int, int, int, int]:
+    """Count non-blank lines and bullets, and measure the longest line and total text, in one pass."""
+    lines = bullets = longest = total = 0
+    for line in content.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        lines += 1
+        bullets += bool(BULLET_PATTERN.match(line))
+        longest = max(longest, len(stripped))
+        total += len(stripped)
+    return lines, bullets, longest, total
+
+
+def _is_permutation(order: list[int], size: int) -> bool:
+    """Check in one pass that order uses every index in range(size) exactly once."""
+    if len(order) != size:
+        return False
+    seen = 0
+    for index in order:
+        if not 0 <= index < size or seen >> index & 1:
+            return False
+        seen |= 1 << index
+    return True
+
+
 class SlideOperations:
     """Slide rewriting with viewport awareness."""
 
     MAX_BULLETS = 6
     MAX_CHARS = 80
     MAX_LINES = 12
+    # Text a slide may hold and still count as simple: about three full bullets
+    SIMPLE_MAX_TEXT = 3 * MAX_CHARS
 
-    def __init__(self, client: AIClient):
-        self.client = client
+    # Prompt templates: viewport limits baked in at class load, the rest filled via format_map
+    REWRITE_PROMPT = f"""Rewrite this slide.
 
-    def rewrite(self, content: str, instruction: str) -> str:
-        """Rewrite slide with custom instruction."""
-        if not self.client.is_available:
-            return content
+Current:
+{{content}}
 
-        prompt = self._create_rewrite_prompt(content, instruction)
-        result = self.client.call(prompt, max_tokens=600, context="Rewrite slide")
-        return sanitize_markdown(result) if result else content
+Instruction: {{instruction}}
 
-    def apply_layout(self, content: str, layout_type: str) -> str:
-        """Apply a specific layout class to slide content."""
-        if not self.client.is_available:
-            return content
+VIEWPORT CONSTRAINTS:
+- Max {MAX_BULLETS} bullets
+- Max {MAX_CHARS} chars per bullet
+- Max {MAX_LINES} lines total
 
-        layout_info = LAYOUT_CLASSES.get(layout_type)
-        if not layout_info:
-            return self.rewrite_layout(content)
+Return markdown only, no code fences."""
 
-        prompt = f"""Reorganize this slide using the "{layout_type}" layout.
+    APPLY_LAYOUT_PROMPT = f"""Reorganize this slide using the "{{layout_type}}" layout.
 
 Current slide:
-{content}
+{{content}}
 
-Target layout: {layout_info['name']} - {layout_info['description']}
+Target layout: {{name}} - {{description}}
 
 Example HTML structure:
-{layout_info['html']}
+{{html}}
 
 Instructions:
 - Keep the same information and meaning
@@ -50,39 +106,89 @@ Instructions:
 - Keep markdown inside the divs
 - Ensure content is balanced across columns/sections
 
-{get_layout_prompt()}
+{LAYOUT_GUIDE}
 
 VIEWPORT CONSTRAINTS:
-- Max {self.MAX_BULLETS} bullets per section
-- Max {self.MAX_CHARS} chars per bullet
+- Max {MAX_BULLETS} bullets per section
+- Max {MAX_CHARS} chars per bullet
 
 Return markdown with HTML layout only, no code fences."""
 
-        result = self.client.call(prompt, max_tokens=800, context=f"Apply {layout_type}")
-        return sanitize_markdown(result) if result else content
-
-    def rewrite_layout(self, content: str) -> str:
-        """Change slide layout while keeping content."""
-        if not self.client.is_available:
-            return content
-
-        prompt = f"""Reorganize this slide with a different layout structure.
+    REWRITE_LAYOUT_PROMPT = f"""Reorganize this slide with a different layout structure.
 
 Current slide:
-{content}
+{{content}}
 
-{get_layout_prompt()}
+{LAYOUT_GUIDE}
 
 Choose the most appropriate layout for this content and apply it.
 Keep the same information but present it in a more visual way.
 
 VIEWPORT CONSTRAINTS:
-- Max {self.MAX_BULLETS} bullets per section
-- Max {self.MAX_CHARS} chars per bullet
+- Max {MAX_BULLETS} bullets per section
+- Max {MAX_CHARS} chars per bullet
 
 Return markdown with HTML layout only, no code fences."""
 
-        result = self.client.call(prompt, max_tokens=800, context="Change layout")
+    SPLIT_PROMPT = f"""This slide has too much content. Split into multiple slides.
+
+Current:
+{{content}}
+
+Rules:
+- Create 2-3 focused slides
+- Max {MAX_BULLETS} bullets each
+- Separate with ---
+- Maintain logical flow
+{{diagram_instruction}}
+
+Return markdown only."""
+
+    def __init__(self, client: AIClient):
+        self.client = client
+
+    def rewrite(self, content: str, instruction: str, use_cache: bool = False) -> str:
+        """Rewrite slide with custom instruction.
+
+        Re-running a rewrite should give a new take, so the response caches are
+        only used for deterministic instructions (``simplify``).
+        """
+        if not self.client.is_available:
+            return content
+
+        prompt = self._create_rewrite_prompt(content, instruction)
+        result = self.client.call(
+            prompt, max_tokens=600, context="Rewrite slide", use_cache=use_cache, shared=use_cache
+        )
+        return sanitize_markdown(result) if result else content
+
+    def apply_layout(self, content: str, layout_type: str) -> str:
+        """Apply a specific layout class to slide content."""
+        if not self.client.is_available:
+            return content
+
+        layout_info = LAYOUT_CLASSES.get(layout_type)
+        if not layout_info:
+            return self.rewrite_layout(content)
+
+        prompt = self.APPLY_LAYOUT_PROMPT.format_map({
+            "layout_type": layout_type,
+            "content": content,
+            "name": layout_info["name"],
+            "description": layout_info["description"],
+            "html": layout_info["html"],
+        })
+
+        result = self.client.call(prompt, max_tokens=800, context=f"Apply {layout_type}", shared=True)
+        return sanitize_markdown(result) if result else content
+
+    def rewrite_layout(self, content: str) -> str:
+        """Change slide layout while keeping content."""
+        if not self.client.is_available:
+            return content
+
+        prompt = self.REWRITE_LAYOUT_PROMPT.format_map({"content": content})
+        result = self.client.call(prompt, max_tokens=800, context="Change layout", use_cache=False)
         return sanitize_markdown(result) if result else content
 
     def restyle(self, content: str, style: str = "modern") -> str:
@@ -92,8 +198,12 @@ Return markdown with HTML layout only, no code fences."""
 
     def simplify(self, content: str) -> str:
         """Simplify slide for clarity."""
+        _, bullets, longest, total = _slide_stats(content)
+        if bullets <= 3 and longest < self.MAX_CHARS and total <= self.SIMPLE_MAX_TEXT:
+            return content
+
         instruction = "Simplify: shorter phrases, remove details, make scannable."
-        return self.rewrite(content, instruction)
+        return self.rewrite(content, instruction, use_cache=True)
 
     def expand(self, content: str) -> str:
         """Expand slide with more detail."""
@@ -102,46 +212,31 @@ Return markdown with HTML layout only, no code fences."""
 
     def split(self, content: str) -> list[str]:
         """Split overloaded slide into multiple slides."""
-        if not self.client.is_available:
+        if not self.client.is_available or self._fits_viewport(content):
             return [content]
 
-        # Detect if slide contains diagram/layout HTML
-        has_diagram = any(cls in content for cls in [
-            'flow-horizontal', 'flow-vertical', 'hierarchy', 'cycle',
-            'pyramid', 'stat-cards', 'timeline', 'columns-', 'feature-grid',
-            'pros-cons', 'comparison'
-        ])
-
-        diagram_instruction = ""
-        if has_diagram:
-            diagram_instruction = """
-IMPORTANT: This slide contains diagram/layout HTML elements.
-- Keep the entire HTML diagram structure intact on ONE slide
-- Do NOT split the HTML diagram itself
-- Split OTHER content (text, bullets before/after) into separate slides
-- If the slide is mostly diagram, create slides for context/explanation"""
-
-        prompt = f"""This slide has too much content. Split into multiple slides.
-
-Current:
-{content}
-
-Rules:
-- Create 2-3 focused slides
-- Max {self.MAX_BULLETS} bullets each
-- Separate with ---
-- Maintain logical flow
-{diagram_instruction}
-
-Return markdown only."""
-
-        result = self.client.call(prompt, max_tokens=1200, context="Split slide")
+        prompt = self._create_split_prompt(content)
+        result = self.client.call(prompt, max_tokens=1200, context="Split slide", shared=True)
         if not result:
             return [content]
 
         blocks = parse_slide_blocks(sanitize_markdown(result))
         return blocks if blocks else [content]
 
+    def split_stream(self, content: str) -> Iterator[str]:
+        """Split an overloaded slide, yielding each new slide as soon as it is generated."""
+        if not self.client.is_available or self._fits_viewport(content):
+            yield content
+            return
+
+        chunks = self.client.stream(self._create_split_prompt(content), max_tokens=1200, context="Split slide")
+        produced = False
+        for block in iter_slide_blocks(chunks):
+            produced = True
+            yield block
+        if not produced:
+            yield content
+
     def duplicate_and_rewrite(self, content: str, new_topic: str) -> str:
         """Duplicate slide and rewrite for a new topic."""
         if not self.client.is_available:
@@ -163,7 +258,7 @@ Instructions:
 
 Return markdown only, no code fences."""
 
-        result = self.client.call(prompt, max_tokens=800, context="Duplicate rewrite")
+        result = self.client.call(prompt, max_tokens=800, context="Duplicate rewrite", use_cache=False)
         return sanitize_markdown(result) if result else content
 
     def rewrite_selected(
@@ -196,29 +291,50 @@ Rules:
 
 Return ONLY the rewritten text, nothing else. No code fences or explanations."""
 
-        result = self.client.call(prompt, max_tokens=300, context="Rewrite selection")
+        result = self.client.call(prompt, max_tokens=300, context="Rewrite selection", use_cache=False)
         return result.strip() if result else selected_text
 
-    def _create_rewrite_prompt(self, content: str, instruction: str) -> str:
-        """Create rewrite prompt with viewport constraints."""
-        return f"""Rewrite this slide.
-
-Current:
-{content}
+    def _fits_viewport(self, content: str) -> bool:
+        """Check whether a slide is within the line and bullet limits."""
+        lines, bullets, _, _ = _slide_stats(content)
+        return lines <= self.MAX_LINES and bullets <= self.MAX_BULLETS
 
-Instruction: {instruction}
+    def _create_split_prompt(self, content: str) -> str:
+        """Create the split prompt, keeping diagram HTML intact when present."""
+        diagram_instruction = ""
+        if DIAGRAM_CLASS_PATTERN.search(content):
+            diagram_instruction = """
+IMPORTANT: This slide contains diagram/layout HTML elements.
+- Keep the entire HTML diagram structure intact on ONE slide
+- Do NOT split the HTML diagram itself
+- Split OTHER content (text, bullets before/after) into separate slides
+- If the slide is mostly diagram, create slides for context/explanation"""
 
-VIEWPORT CONSTRAINTS:
-- Max {self.MAX_BULLETS} bullets
-- Max {self.MAX_CHARS} chars per bullet
-- Max {self.MAX_LINES} lines total
+        return self.SPLIT_PROMPT.format_map({"content": content, "diagram_instruction": diagram_instruction})
 
-Return markdown only, no code fences."""
+    def _create_rewrite_prompt(self, content: str, instruction: str) -> str:
+        """Create rewrite prompt with viewport constraints."""
+        return self.REWRITE_PROMPT.format_map({"content": content, "instruction": instruction})
 
 
 class PresentationTransformer:
     """Transform entire presentations."""
 
+    # Slides packed into one style-transform request
+    TRANSFORM_CHUNK = 5
+
+    # Largest deck reordered and restyled in a single request
+    ONE_SHOT_MAX_SLIDES = 10
+
+    STYLE_PROMPTS = {
+        "story": "Convert to storytelling format with narrative arc, characters, conflict, resolution.",
+        "teaching": "Convert to educational style with learning objectives, explanations, examples, exercises.",
+        "pitch": "Convert to pitch deck style - problem, solution, traction, team, ask.",
+        "workshop": "Convert to workshop format with activities, discussions, hands-on exercises.",
+        "technical": "Convert to technical documentation style with specs, diagrams, code examples.",
+        "executive": "Convert to executive summary style - key insights, metrics, recommendations.",
+    }
+
     def __init__(self, client: AIClient):
         self.client = client
 
@@ -244,50 +360,106 @@ Instructions:
 
 Return ONLY the comma-separated list of slide numbers in new order."""
 
-        result = self.client.call(prompt, max_tokens=100, context="Rearrange slides")
+        result = self.client.call(prompt, max_tokens=100, context="Rearrange slides", shared=True)
         if not result:
             return slides
 
         try:
             new_order = [int(n.strip()) - 1 for n in result.split(",")]
-            if sorted(new_order) != list(range(len(slides))):
+            if not _is_permutation(new_order, len(slides)):
                 return slides
             return [slides[i] for i in new_order]
         except (ValueError, IndexError):
             return slides
 
+    def rearrange_and_transform(self, slides: list[str], style: str) -> list[str]:
+        """Reorder and restyle a presentation, in one request for small decks.
+
+        Falls back to ``rearrange`` followed by ``transform_style`` when the
+        deck is large or the combined reply is unusable.
+        """
+        if not self.client.is_available or len(slides) < 2:
+            return self.transform_style(slides, style)
+        if len(slides) > self.ONE_SHOT_MAX_SLIDES:
+            return self.transform_style(self.rearrange(slides), style)
+
+        style_instruction = self.STYLE_PROMPTS.get(style, f"Transform to {style} style.")
+        slides_text = "\n\n".join(f"[Slide {i+1}]\n{s}" for i, s in enumerate(slides))
+        prompt = f"""Reorder these slides for cohesion, then transform each one.
+
+Current slides:
+{slides_text}
+
+Step 1 - order:
+- Group related topics together
+- Keep intro (if exists) first and conclusion (if exists) last
+
+Step 2 - style: {style_instruction}
+Keep core information but adapt presentation style.
+
+Return JSON only:
+{{"order": [2, 1, 3], "slides": ["transformed markdown in the new order", "..."]}}"""
+
+        result = self.client.call(
+            prompt, max_tokens=600 * len(slides) + 100, context=f"Rearrange and {style}", use_cache=False
+        )
+        data = extract_json(result) if result else None
+        if data:
+            try:
+                order = [int(n) - 1 for n in data.get("order", [])]
+                transformed = [sanitize_markdown(s) for s in data.get("slides", [])]
+                if _is_permutation(order, len(slides)) and len(transformed) == len(slides) and all(transformed):
+                    return transformed
+            except (TypeError, ValueError, AttributeError):
+                pass
+
+        logger.warning("Combined rearrange/transform reply unusable; using two steps")
+        return self.transform_style(self.rearrange(slides), style)
+
     def transform_style(self, slides: list[str], style: str) -> list[str]:
         """Transform presentation to a specific style."""
         if not self.client.is_available:
             return slides
 
-        style_prompts = {
-            "story": "Convert to storytelling format with narrative arc, characters, conflict, resolution.",
-            "teaching": "Convert to educational style with learning objectives, explanations, examples, exercises.",
-            "pitch": "Convert to pitch deck style - problem, solution, traction, team, ask.",
-            "workshop": "Convert to workshop format with activities, discussions, hands-on exercises.",
-            "technical": "Convert to technical documentation style with specs, diagrams, code examples.",
-            "executive": "Convert to executive summary style - key insights, metrics, recommendations.",
-        }
+        style_instruction = self.STYLE_PROMPTS.get(style, f"Transform to {style} style.")
+
+        # Pack several slides per request; slides are independent so chunks run concurrently
+        chunks = [slides[i:i + self.TRANSFORM_CHUNK] for i in range(0, len(slides), self.TRANSFORM_CHUNK)]
+        prompts = [self._create_transform_prompt(chunk, style_instruction) for chunk in chunks]
+        budgets = [600 * len(chunk) for chunk in chunks]
+        results = self.client.call_many(prompts, max_tokens=budgets, context=f"Transform {style}", use_cache=False)
+
+        transformed: list[str] = []
+        retry: list[int] = []
+        for chunk, result in zip(chunks, results):
+            blocks = _split_marshaled(result, len(chunk)) if result else list(chunk)
+            if blocks is None:
+                retry.extend(range(len(transformed), len(transformed) + len(chunk)))
+                blocks = list(chunk)
+            transformed.extend(blocks)
+
+        # Chunks whose reply did not split cleanly are redone one slide per request
+        if retry:
+            prompts = [self._create_transform_prompt([slides[i]], style_instruction) for i in retry]
+            results = self.client.call_many(prompts, max_tokens=600, context=f"Transform {style}", use_cache=False)
+            for i, result in zip(retry, results):
+                blocks = _split_marshaled(result, 1) if result else None
+                transformed[i] = blocks[0] if blocks else slides[i]
 
-        style_instruction = style_prompts.get(style, f"Transform to {style} style.")
-        transformed = []
+        return transformed
 
-        for slide in slides:
-            prompt = f"""Transform this slide.
-
-Current:
-{slide}
+    def _create_transform_prompt(self, slides: list[str], style_instruction: str) -> str:
+        """Create a style transform prompt for one or more slides."""
+        marshaled = "".join(f"{SLIDE_SENTINEL}\n{slide}\n" for slide in slides)
+        return f"""Transform each of the following {len(slides)} slide(s).
 
 Style: {style_instruction}
 
 Keep core information but adapt presentation style.
-Return markdown only, no code fences."""
-
-            result = self.client.call(prompt, max_tokens=600, context=f"Transform {style}")
-            transformed.append(sanitize_markdown(result) if result else slide)
+Return the transformed slides in the same order, each preceded by a {SLIDE_SENTINEL} line.
+Return markdown only, no code fences.
 
-        return transformed
+{marshaled}"""
 
     def rewrite_for_topic(
         self, slides: list[str], new_topic: str, keep_style: bool = True
@@ -300,11 +472,39 @@ Return markdown only, no code fences."""
             return self._rewrite_keeping_style(slides, new_topic)
         return self._rewrite_fresh(slides, new_topic)
 
+    def submit_topic_rewrite(self, slides: list[str], new_topic: str) -> str | None:
+        """Queue a keep-style topic rewrite on the batch API; returns the batch id."""
+        if not self.client.is_available or not slides:
+            return None
+        prompts = self._create_topic_prompts(slides, new_topic)
+        return self.client.submit_batch(prompts, max_tokens=800, context="Rewrite batch")
+
+    def collect_topic_rewrite(self, batch_id: str, slides: list[str]) -> list[str] | None:
+        """Return rewritten slides once the batch has ended (originals where it failed), else None.
+
+        Raises BatchError (BatchNotFoundError for an unknown id) if the batch cannot be read.
+        """
+        results = self.client.fetch_batch(batch_id, len(slides), context="Rewrite batch")
+        if results is None:
+            return None
+        return [
+            sanitize_markdown(result) if result else slide
+            for slide, result in zip(slides, results)
+        ]
+
     def _rewrite_keeping_style(self, slides: list[str], new_topic: str) -> list[str]:
-        """Rewrite keeping the same structure and style."""
-        rewritten = []
-        for i, slide in enumerate(slides):
-            prompt = f"""Rewrite this slide for a new topic while keeping exact structure.
+        """Rewrite keeping the same structure and style, all slides concurrently."""
+        prompts = self._create_topic_prompts(slides, new_topic)
+        results = self.client.call_many(prompts, max_tokens=800, context="Rewrite slide", use_cache=False)
+        return [
+            sanitize_markdown(result) if result else slide
+            for slide, result in zip(slides, results)
+        ]
+
+    def _create_topic_prompts(self, slides: list[str], new_topic: str) -> list[str]:
+        """Create one keep-structure rewrite prompt per slide."""
+        return [
+            f"""Rewrite this slide for a new topic while keeping exact structure.
 
 Original slide:
 {slide}
@@ -320,11 +520,8 @@ Instructions:
 - Maintain transitions if this isn't the first slide
 
 Return markdown only, no code fences."""
-
-            result = self.client.call(prompt, max_tokens=800, context=f"Rewrite slide {i+1}")
-            rewritten.append(sanitize_markdown(result) if result else slide)
-
-        return rewritten
+            for i, slide in enumerate(slides)
+        ]
 
     def _rewrite_fresh(self, slides: list[str], new_topic: str) -> list[str]:
         """Generate fresh content for new topic with similar slide count."""
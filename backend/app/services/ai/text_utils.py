@@ -2,92 +2,248 @@
 
 import json
 import re
-from typing import Optional
+from functools import lru_cache
+from typing import Any, Iterable, Iterator, Optional
 from loguru import logger
 
+try:
+    from orjson import dumps as json_dumps, loads as json_loads  # Rust codec when installed
+except ImportError:
+    from json import loads as json_loads
 
-# Pre-compiled regex patterns
-JSON_FENCE_PATTERN = re.compile(r"```(?:json)?\s*(\{.*?\})\s*```", re.DOTALL)
-MD_FENCE_PATTERN = re.compile(r"^```(?:markdown|md)?\s*([\s\S]*?)\s*```$", re.IGNORECASE)
+    # Non-default options make json.dumps build an encoder per call; share one instead
+    _JSON_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
 
+    def json_dumps(obj: Any) -> bytes:
+        """Serialize to compact UTF-8 JSON bytes (matches orjson.dumps)."""
+        return _JSON_ENCODER.encode(obj).encode()
 
+try:
+    import re2 as untrusted_re  # google-re2: linear-time matching on raw model output
+except ImportError:
+    untrusted_re = re
+
+# json_dumps/json_loads are re-exported: callers share the codec picked above
+__all__ = [
+    "json_dumps",
+    "json_loads",
+    "extract_json",
+    "extract_json_array",
+    "scan_array_objects",
+    "strip_code_fence",
+    "strip_frontmatter",
+    "sanitize_markdown",
+    "fix_broken_comments",
+    "parse_slide_blocks",
+    "iter_slide_blocks",
+    "format_for_audio",
+]
+
+
+# Shared stdlib decoder for JSON followed by trailing prose (orjson has no raw_decode)
+JSON_DECODER = json.JSONDecoder()
+
+# Pre-compiled regex patterns. The lazy fence/frontmatter patterns run on whole
+# model replies, so they use RE2 when installed.
+SLIDE_BREAK_PATTERN = re.compile(r"\n---\s*\n")
+JSON_FENCE_PREFIX_PATTERN = re.compile(r"^```(?:json)?\s*")
+JSON_FENCE_SUFFIX_PATTERN = untrusted_re.compile(r"\s*```$")
+FRONTMATTER_PATTERN = untrusted_re.compile(r"^---\s*[\s\S]*?---\s*")
+
+# Streaming JSON scan: the separators between array items, and (_object_end)
+# a brace, a complete string, or the opening quote of a string not yet closed
+JSON_SEPARATOR_PATTERN = re.compile(r"[ \t\r\n,]*")
+JSON_TOKEN_PATTERN = re.compile(r'[{}]|"[^"\\]*(?:\\.[^"\\]*)*"|"', re.DOTALL)
+
+# Comment repair (fix_broken_comments)
+DOUBLE_OPEN_PATTERN = re.compile(r"<!--\s*<!--")
+DOUBLE_CLOSE_PATTERN = re.compile(r"-->\s*-->")
+EMPTY_COMMENT_PATTERN = re.compile(r"<!--\s*\n\s*-->")
+
+# Markdown stripped for speech (format_for_audio), in this order: each pass
+# sees the previous one's output, so "# - x" loses both prefixes
+BOLD_PATTERN = re.compile(r"\*\*([^*]+)\*\*")
+ITALIC_PATTERN = re.compile(r"\*([^*]+)\*")
+INLINE_CODE_PATTERN = re.compile(r"`([^`]+)`")
+HEADING_PATTERN = re.compile(r"^#+\s*", re.MULTILINE)
+BULLET_PREFIX_PATTERN = re.compile(r"^[-*]\s*", re.MULTILINE)
+NARRATION_PATTERN = re.compile(r"^(?:NARRATION|Narration):\s*", re.IGNORECASE)
+
+
+@lru_cache(maxsize=128)
 def extract_json(raw: str) -> Optional[dict]:
-    """Extract JSON from AI response, handling code fences."""
+    """Extract JSON from AI response, handling code fences.
+
+    Memoized, since cached replies and retries re-parse the same text;
+    the result is shared, so callers must not mutate it.
+    """
     if not raw:
         return None
     cleaned = raw.strip()
 
-    # Try raw_decode first
-    try:
-        parsed, _ = json.JSONDecoder().raw_decode(cleaned)
-        return parsed
-    except json.JSONDecodeError:
-        pass
+    # Only a reply opening with a bracket can parse directly; prose goes to the fence search
+    if cleaned.startswith(("{", "[")):
+        # Fast path: the whole response is JSON
+        try:
+            return json_loads(cleaned)
+        except ValueError:
+            pass
 
-    # Try extracting from code fence
-    fenced = JSON_FENCE_PATTERN.search(cleaned)
-    if fenced:
+        # JSON followed by trailing prose
         try:
-            return json.loads(fenced.group(1))
+            parsed, _ = JSON_DECODER.raw_decode(cleaned)
+            return parsed
         except json.JSONDecodeError:
             pass
 
-    # Last resort: direct parse
-    try:
-        return json.loads(cleaned)
-    except json.JSONDecodeError:
-        logger.error(f"JSON parse failed. First 300 chars: {cleaned[:300]}")
-        return None
+    # Try extracting the first object inside a code fence
+    fence = cleaned.find("```")
+    start = cleaned.find("{", fence) if fence >= 0 else -1
+    end = _object_end(cleaned, start) if start >= 0 else -1
+    if end > 0:
+        try:
+            return json_loads(cleaned[start:end])
+        except ValueError:
+            pass
+
+    logger.error(f"JSON parse failed. First 300 chars: {cleaned[:300]}")
+    return None
 
 
+@lru_cache(maxsize=128)
 def extract_json_array(raw: str) -> Optional[list]:
-    """Extract JSON array from AI response."""
+    """Extract JSON array from AI response (memoized; do not mutate the result)."""
     if not raw:
         return None
     cleaned = raw.strip()
 
     # Remove code fences if present
     if cleaned.startswith("```"):
-        cleaned = re.sub(r"^```(?:json)?\s*", "", cleaned)
-        cleaned = re.sub(r"\s*```$", "", cleaned)
+        cleaned = JSON_FENCE_PREFIX_PATTERN.sub("", cleaned)
+        cleaned = JSON_FENCE_SUFFIX_PATTERN.sub("", cleaned)
+
+    if not cleaned.startswith("["):
+        logger.error("Failed to parse JSON array")
+        return None
 
     try:
-        result = json.loads(cleaned)
+        result = json_loads(cleaned)
         return result if isinstance(result, list) else None
-    except json.JSONDecodeError:
+    except ValueError:
         logger.error("Failed to parse JSON array")
         return None
 
 
+def scan_array_objects(text: str, key: str, pos: int = 0) -> tuple[list[dict[str, Any]], int]:
+    """Parse the complete objects of a JSON array that is still streaming in.
+
+    Returns the objects closed since ``pos`` and the position to resume from;
+    pass the returned position back in as more text arrives.
+    """
+    if not pos:
+        start = text.find(f'"{key}"')
+        bracket = text.find("[", start) if start >= 0 else -1
+        if bracket < 0:
+            return [], 0
+        pos = bracket + 1
+
+    # Bound once: the loop runs per object on every streamed chunk
+    objects: list[dict[str, Any]] = []
+    append, skip_separators = objects.append, JSON_SEPARATOR_PATTERN.match
+    while True:
+        # The separator pattern matches the empty string, so this is never None
+        separators = skip_separators(text, pos)
+        if separators is not None:
+            pos = separators.end()
+        if not text.startswith("{", pos):
+            return objects, pos
+        end = _object_end(text, pos)
+        if end < 0:
+            return objects, pos
+        try:
+            append(json_loads(text[pos:end]))
+        except ValueError:
+            return objects, pos
+        pos = end
+
+
+def _object_end(text: str, start: int) -> int:
+    """Return the index just past the object opening at ``start``, or -1 if unclosed.
+
+    Tokenizes braces and whole strings with one compiled pattern instead of
+    stepping through every character in Python.
+    """
+    depth = 0
+    for token in JSON_TOKEN_PATTERN.finditer(text, start):
+        ch = token.group()
+        if ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return token.end()
+        elif ch == '"':
+            return -1
+    return -1
+
+
 def strip_code_fence(text: str) -> str:
     """Remove markdown code fences from text."""
     if not text:
         return text
-    match = MD_FENCE_PATTERN.match(text.strip())
-    return match.group(1).strip() if match else text.strip()
+    return _strip_code_fence(text.strip())
+
+
+def _strip_code_fence(stripped: str) -> str:
+    """Unwrap a fence from already-stripped text with literal checks, no regex."""
+    if len(stripped) < 6 or not stripped.startswith("```") or not stripped.endswith("```"):
+        return stripped
+    body = stripped[3:-3]
+    tag = body[:8].lower()
+    if tag == "markdown":
+        body = body[8:]
+    elif tag.startswith("md"):
+        body = body[2:]
+    return body.strip()
 
 
 def strip_frontmatter(text: str) -> str:
     """Remove YAML frontmatter from markdown."""
     if not text:
         return text
-    return re.sub(r"^---\s*[\s\S]*?---\s*", "", text.strip())
+    return _strip_frontmatter(text.strip())
+
+
+def _strip_frontmatter(stripped: str) -> str:
+    """Remove frontmatter from already-stripped text; only a leading "---" can open it."""
+    return FRONTMATTER_PATTERN.sub("", stripped) if stripped.startswith("---") else stripped
 
 
+@lru_cache(maxsize=256)
 def sanitize_markdown(text: str) -> str:
-    """Clean AI-generated markdown content."""
-    cleaned = strip_code_fence(text or "")
-    cleaned = strip_frontmatter(cleaned)
-    return cleaned.strip()
+    """Clean AI-generated markdown content (memoized: retries and undo repeat inputs).
+
+    Guards and strips once up front; the helpers trim what remains around
+    anything they remove, so the result needs no further strip.
+    """
+    if not text:
+        return ""
+    return _strip_frontmatter(_strip_code_fence(text.strip()))
 
 
 def fix_broken_comments(text: str) -> str:
     """Fix malformed HTML comment blocks."""
-    text = re.sub(r"<!--\s*<!--", "<!--", text)
-    text = re.sub(r"-->\s*-->", "-->", text)
+    # Well-formed slides skip every pass that cannot match
+    has_open = "<!--" in text
+    if "-->" in text:
+        text = DOUBLE_CLOSE_PATTERN.sub("-->", text)
+    if not has_open:
+        return text
+
+    text = DOUBLE_OPEN_PATTERN.sub("<!--", text)
     if text.count("<!--") > text.count("-->"):
         text = text + "\n-->"
-    text = re.sub(r"<!--\s*\n\s*-->", "", text)
+    text = EMPTY_COMMENT_PATTERN.sub("", text)
     return text
 
 
@@ -95,8 +251,71 @@ def parse_slide_blocks(content: str) -> list[str]:
     """Parse slide content into individual blocks."""
     if not content:
         return []
-    blocks = re.split(r"\n---\s*\n", content)
-    return [b.strip() for b in blocks if b.strip()]
+    # Strip each block once, through the C method rather than a per-block lookup
+    return [b for b in map(str.strip, SLIDE_BREAK_PATTERN.split(content)) if b]
+
+
+def iter_slide_blocks(chunks: Iterable[str]) -> Iterator[str]:
+    """Yield slide blocks from streamed markdown as soon as each one closes.
+
+    Agrees with ``parse_slide_blocks(sanitize_markdown(reply))``: a fence
+    wrapping the whole reply and leading frontmatter are dropped, while code
+    fences inside slides are kept. An opening wrapper fence is dropped even
+    if the reply never closes it.
+    """
+    buffer, fenced, opened = "", False, False
+    for chunk in chunks:
+        buffer += chunk
+        if not opened:
+            head = _open_stream(buffer, final=False)
+            if head is None:
+                continue
+            (buffer, fenced), opened = head, True
+        while match := SLIDE_BREAK_PATTERN.search(buffer):
+            block = buffer[:match.start()].strip()
+            buffer = buffer[match.end():]
+            if block:
+                yield block
+    if not opened:
+        # A final open always decides, so this only narrows the Optional
+        head = _open_stream(buffer, final=True)
+        if head is not None:
+            buffer, fenced = head
+    block = buffer.strip()
+    if fenced and block.endswith("```"):
+        block = block[:-3].strip()
+    if block:
+        yield block
+
+
+def _open_stream(buffer: str, final: bool) -> Optional[tuple[str, bool]]:
+    """Drop a wrapper fence's opening line and frontmatter from the start of a stream.
+
+    Returns ``(rest, fenced)``, or None while more text is needed to decide.
+    """
+    text = buffer.lstrip()
+    fenced = text.startswith("```")
+    if fenced:
+        text = text[3:]
+        # The "markdown"/"md" tag may still be arriving
+        if len(text) < 8 and "\n" not in text and not final:
+            return None
+        tag = text[:8].lower()
+        if tag == "markdown":
+            text = text[8:]
+        elif tag.startswith("md"):
+            text = text[2:]
+        text = text.lstrip()
+    if len(text) < 3 and not final:
+        return None
+    if text.startswith("---"):
+        match = FRONTMATTER_PATTERN.match(text)
+        # Its trailing whitespace run is only settled once other text follows
+        if (not match or match.end() == len(text)) and not final:
+            return None
+        if match:
+            text = text[match.end():]
+    return text, fenced
 
 
 def format_for_audio(text: str) -> str:
@@ -104,14 +323,26 @@ def format_for_audio(text: str) -> str:
     if not text:
         return ""
 
-    # Remove markdown formatting
-    text = re.sub(r"\*\*([^*]+)\*\*", r"\1", text)
-    text = re.sub(r"\*([^*]+)\*", r"\1", text)
-    text = re.sub(r"`([^`]+)`", r"\1", text)
-    text = re.sub(r"^#+\s*", "", text, flags=re.MULTILINE)
-    text = re.sub(r"^[-*]\s*", "", text, flags=re.MULTILINE)
+    # Remove markdown formatting; a pass whose marker is absent is skipped,
+    # so plain prose (the common case) runs no regex
+    if "*" in text:
+        text = BOLD_PATTERN.sub(r"\1", text)
+        text = ITALIC_PATTERN.sub(r"\1", text)
+    if "`" in text:
+        text = INLINE_CODE_PATTERN.sub(r"\1", text)
+    if _starts_a_line(text, "#"):
+        text = HEADING_PATTERN.sub("", text)
+    if _starts_a_line(text, "-") or _starts_a_line(text, "*"):
+        text = BULLET_PREFIX_PATTERN.sub("", text)
 
-    # Clean NARRATION prefix
-    text = re.sub(r"^(?:NARRATION|Narration):\s*", "", text, flags=re.IGNORECASE)
+    # Clean NARRATION prefix (anchored, so a match attempt costs O(1))
+    prefix = NARRATION_PATTERN.match(text)
+    if prefix:
+        text = text[prefix.end():]
 
     return text.strip()
+
+
+def _starts_a_line(text: str, marker: str) -> bool:
+    """Check with substring scans whether any line of ``text`` starts with ``marker``."""
+    return text.startswith(marker) or f"\n{marker}" in text
@@ -1,11 +1,29 @@
 """Theme CSS generation."""
 
+from functools import lru_cache
 from typing import Optional
 from loguru import logger
 
 from .client import AIClient
 
 
+# Prompt template, filled with str.format_map
+THEME_PROMPT = """Generate a Marp theme CSS file.
+
+Colors:
+{color_list}
+
+Theme: {name}{style}
+
+Include:
+1. :root variables for colors
+2. Section styling
+3. Typography (h1-h6, p, code)
+4. Lists, blockquotes, tables
+
+Return CSS only, no markdown."""
+
+
 class ThemeGenerator:
     """Generate Marp theme CSS from brand colors."""
 
@@ -23,7 +41,7 @@ class ThemeGenerator:
             logger.error("AI client not available")
             return None
 
-        prompt = self._create_prompt(name, colors, description)
+        prompt = self._create_prompt(name, tuple(colors), description)
         content = self.client.call(prompt, max_tokens=2000, context="Generate theme")
 
         if not content:
@@ -31,30 +49,25 @@ class ThemeGenerator:
 
         return self._clean_css(content)
 
-    def _create_prompt(self, name: str, colors: list[str], description: str) -> str:
-        """Create theme generation prompt."""
-        color_list = "\n".join(f"Color {i+1}: {c}" for i, c in enumerate(colors))
-        style = f"\nStyle: {description}" if description else ""
-
-        return f"""Generate a Marp theme CSS file.
-
-Colors:
-{color_list}
-
-Theme: {name}{style}
-
-Include:
-1. :root variables for colors
-2. Section styling
-3. Typography (h1-h6, p, code)
-4. Lists, blockquotes, tables
-
-Return CSS only, no markdown."""
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _create_prompt(name: str, colors: tuple[str, ...], description: str) -> str:
+        """Create theme generation prompt (memoized: brand themes are re-requested)."""
+        return THEME_PROMPT.format_map({
+            "color_list": "\n".join(f"Color {i+1}: {c}" for i, c in enumerate(colors)),
+            "name": name,
+            "style": f"\nStyle: {description}" if description else "",
+        })
 
     def _clean_css(self, content: str) -> str:
-        """Remove code fences if present."""
+        """Remove code fences if present, slicing rather than splitting into lines."""
         content = content.strip()
-        if content.startswith("```"):
-            lines = content.split("\n")
-            return "\n".join(lines[1:-1]) if len(lines) > 2 else content
-        return content
+        if not content.startswith("```"):
+            return content
+        first_nl = content.find("\n")
+        if first_nl == -1:
+            return content
+        last_fence = content.rfind("```")
+        # A reply cut off at max_tokens has no closing fence: keep everything after the opener
+        end = last_fence if last_fence > first_nl else len(content)
+        return content[first_nl + 1:end].strip()
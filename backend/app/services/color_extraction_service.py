@@ -1,13 +1,21 @@
 """Service for extracting colors from images using Claude Vision."""
 
-import json
+import copy
 import os
 import re
-from typing import Optional
+import threading
+from typing import Any, Optional
 import httpx
 from anthropic import Anthropic
 from loguru import logger
 
+from app.core.cache import create_palette_cache, generate_palette_key
+from app.services.ai.client import HTTP2_AVAILABLE
+from app.services.ai.text_utils import extract_json
+
+
+HEX_COLOR_PATTERN = re.compile(r"^#[0-9a-fA-F]{6}$")
+
 
 class ColorExtractionService:
     """Service for extracting color palettes from images using Claude Vision."""
@@ -19,6 +27,8 @@ class ColorExtractionService:
         self.deployment = os.getenv("AZURE_DEPLOYMENT", "claude-haiku-4-5")
         self.api_version = os.getenv("AZURE_API_VERSION", "2024-05-01-preview")
         self.anthropic_version = os.getenv("ANTHROPIC_VERSION", "2023-06-01")
+        self._palette_cache = create_palette_cache()
+        self._palette_lock = threading.Lock()
 
         if not self.azure_endpoint or not self.api_key:
             logger.warning("Azure credentials not configured for color extraction")
@@ -30,9 +40,11 @@ class ColorExtractionService:
                 "anthropic-version": self.anthropic_version,
             }
             http_client = httpx.Client(
+                http2=HTTP2_AVAILABLE,
                 timeout=30.0,
                 base_url=base_url,
                 params={"api-version": self.api_version},
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=60),
             )
             self.client = Anthropic(
                 base_url=base_url,
@@ -45,7 +57,7 @@ class ColorExtractionService:
         self,
         base64_image: str,
         media_type: str = "image/png"
-    ) -> Optional[dict]:
+    ) -> Optional[dict[str, Any]]:
         """Extract color palette from an image.
 
         Args:
@@ -59,6 +71,24 @@ class ColorExtractionService:
             logger.error("AI client not initialized for color extraction")
             return None
 
+        # Re-uploading the same brand image skips the vision call
+        key = generate_palette_key(base64_image, media_type, self.deployment)
+        with self._palette_lock:
+            cached = self._palette_cache.get(key)
+        # Callers own their palette: the cache keeps a private copy
+        if cached is not None:
+            return copy.deepcopy(cached)
+
+        result = self._request_colors(base64_image, media_type)
+        if result:
+            with self._palette_lock:
+                self._palette_cache[key] = copy.deepcopy(result)
+        return result
+
+    def _request_colors(self, base64_image: str, media_type: str) -> Optional[dict[str, Any]]:
+        """Ask the vision model for the palette and parse its reply."""
+        if self.client is None:
+            return None
         try:
             prompt = """Analyze this image/screenshot and extract the dominant color palette.
 
@@ -124,29 +154,10 @@ Return ONLY valid JSON, no additional text."""
 
     def _parse_color_response(self, content: str) -> Optional[dict]:
         """Parse the AI response to extract color data."""
-        try:
-            # Try to parse as JSON directly
-            data = json.loads(content)
-            return self._validate_color_data(data)
-        except json.JSONDecodeError:
-            pass
-
-        # Try to extract JSON from code fences
-        json_match = re.search(r"```(?:json)?\s*(\{[\s\S]*?\})\s*```", content)
-        if json_match:
-            try:
-                data = json.loads(json_match.group(1))
-                return self._validate_color_data(data)
-            except json.JSONDecodeError:
-                pass
-
-        # Try raw_decode
-        try:
-            decoder = json.JSONDecoder()
-            data, _ = decoder.raw_decode(content)
+        # extract_json only attempts a parse when the reply can be JSON, then tries the fence
+        data = extract_json(content)
+        if isinstance(data, dict):
             return self._validate_color_data(data)
-        except json.JSONDecodeError:
-            pass
 
         logger.error(f"Failed to parse color extraction response: {content[:200]}")
         return None
@@ -160,18 +171,17 @@ Return ONLY valid JSON, no additional text."""
         # Validate hex colors
         valid_colors = []
         valid_color_names = {}
-        hex_pattern = re.compile(r"^#[0-9a-fA-F]{6}$")
 
         for color in colors:
             if isinstance(color, str):
                 # Normalize to uppercase
                 color = color.upper()
-                if hex_pattern.match(color):
+                if HEX_COLOR_PATTERN.match(color):
                     valid_colors.append(color)
 
         for hex_code, name in color_names.items():
             normalized = hex_code.upper()
-            if hex_pattern.match(normalized):
+            if HEX_COLOR_PATTERN.match(normalized):
                 valid_color_names[normalized] = name
 
         return {
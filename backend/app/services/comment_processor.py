@@ -4,25 +4,53 @@ import re
 from typing import Optional
 
 
+# Pre-compiled regex patterns
+CODE_BLOCK_PATTERN = re.compile(r"```[\s\S]*?```")
+IMAGE_PATTERN = re.compile(r"!\[([^\]]*)\]\([^)]+\)")
+LINK_PATTERN = re.compile(r"\[([^\]]+)\]\([^)]+\)")
+BULLET_PATTERN = re.compile(r"^\s*[-*+]\s+", re.MULTILINE)
+WHITESPACE_PATTERN = re.compile(r"\s+")
+SENTENCE_END_PATTERN = re.compile(r"[.!?]\s+")
+
+# Markdown punctuation deleted in one C-level pass
+MARKDOWN_PUNCT_TABLE = str.maketrans("", "", "#>*`_~")
+
+
 class CommentProcessor:
     """Handles comment length enforcement and narration generation for slides."""
 
     @staticmethod
     def strip_markdown_for_length(text: str) -> str:
         """Strip markdown formatting to measure actual text length."""
-        cleaned = re.sub(r"```[\s\S]*?```", "", text)
-        cleaned = re.sub(r"!\[([^\]]*)\]\([^)]+\)", r"\1", cleaned)
-        cleaned = re.sub(r"\[([^\]]+)\]\([^)]+\)", r"\1", cleaned)
-        cleaned = re.sub(r"^\s*[-*+]\s+", "", cleaned, flags=re.MULTILINE)
-        cleaned = re.sub(r"[#>*`_~]", "", cleaned)
-        cleaned = re.sub(r"\s+", " ", cleaned).strip()
-        return cleaned
+        cleaned = CommentProcessor._strip_markdown_markup(text)
+        return WHITESPACE_PATTERN.sub(" ", cleaned).strip()
+
+    @staticmethod
+    def markdown_text_length(text: str) -> int:
+        """Length of ``strip_markdown_for_length(text)`` without building the collapsed string."""
+        words = CommentProcessor._strip_markdown_markup(text).split()
+        return sum(map(len, words)) + len(words) - 1 if words else 0
+
+    @staticmethod
+    def _strip_markdown_markup(text: str) -> str:
+        """Remove code blocks, link/image syntax, bullets and emphasis; passes with no marker are skipped."""
+        if "```" in text:
+            text = CODE_BLOCK_PATTERN.sub("", text)
+        if "](" in text:
+            text = IMAGE_PATTERN.sub(r"\1", text)
+            text = LINK_PATTERN.sub(r"\1", text)
+        text = BULLET_PATTERN.sub("", text)
+        return text.translate(MARKDOWN_PUNCT_TABLE)
+
+    @staticmethod
+    def _fits_length(text: str, max_len: int) -> bool:
+        """Whether text is at most max_len long once markdown is stripped."""
+        return len(text) <= max_len or CommentProcessor.markdown_text_length(text) <= max_len
 
     @staticmethod
     def measure_slide_text_length(text: str) -> int:
         """Measure the effective text length of a slide after stripping markdown."""
-        cleaned = CommentProcessor.strip_markdown_for_length(text)
-        return len(cleaned)
+        return CommentProcessor.markdown_text_length(text)
 
     @staticmethod
     def truncate_comment(comment: str, max_len: int) -> str:
@@ -31,24 +59,36 @@ class CommentProcessor:
         if len(comment) <= max_len:
             return comment
 
-        sentences = re.split(r"(?<=[.!?])\s+", comment)
-        if len(sentences) > 1:
-            collected = []
-            current_len = 0
-            for sentence in sentences:
-                next_len = current_len + len(sentence) + (1 if collected else 0)
-                if next_len > max_len:
-                    break
-                collected.append(sentence)
-                current_len = next_len
-            if collected:
-                return " ".join(collected).strip()
+        collected = CommentProcessor._leading_sentences(comment, max_len)
+        if collected:
+            return " ".join(collected).strip()
 
         trimmed = comment[:max_len].rsplit(" ", 1)[0].strip()
         if not trimmed:
             trimmed = comment[:max_len].strip()
         return trimmed
 
+    @staticmethod
+    def _leading_sentences(comment: str, max_len: int) -> list[str]:
+        """Whole sentences from the start of comment that fit in max_len when joined by spaces.
+
+        Sentence ends are found lazily and scanning stops at the first sentence
+        that does not fit, so long comments are never split in full.
+        """
+        collected: list[str] = []
+        current_len = 0
+        start = 0
+        for match in SENTENCE_END_PATTERN.finditer(comment):
+            sentence = comment[start:match.start() + 1]
+            current_len += len(sentence) + (1 if collected else 0)
+            if current_len > max_len:
+                return collected
+            collected.append(sentence)
+            start = match.end()
+        if collected and current_len + len(comment) - start + 1 <= max_len:
+            collected.append(comment[start:])
+        return collected
+
     @staticmethod
     def limit_comment_length(comment: str, slide_content: str, max_ratio: float) -> str:
         """Limit comment length based on a ratio to slide content length."""
@@ -84,14 +124,13 @@ class CommentProcessor:
             return comment.strip()
 
         max_len = max(1, int(slide_len * max_ratio))
-        comment_len = len(CommentProcessor.strip_markdown_for_length(comment))
-
-        if comment_len <= max_len:
+        # Stripping markdown never lengthens text, so a raw length within the
+        # limit settles the check without measuring
+        if CommentProcessor._fits_length(comment, max_len):
             return comment.strip()
 
         # If comment is too long, use fallback
-        fallback_len = len(CommentProcessor.strip_markdown_for_length(fallback_comment))
-        if fallback_len <= max_len:
+        if CommentProcessor._fits_length(fallback_comment, max_len):
             return fallback_comment
 
         # If even fallback is too long, truncate it
@@ -1,4 +1,5 @@
 import os
+import re
 import subprocess
 import tempfile
 import shlex
@@ -16,6 +17,17 @@ THEMES_DIR = BASE_DIR / "themes"
 THEME_CACHE_DIR = BASE_DIR / "data" / "theme_cache"
 MARP_CONFIG_PATH = BASE_DIR / "marp.config.js"
 
+# Pre-compiled patterns for the fallback HTML renderer (run per slide)
+H1_PATTERN = re.compile(r'^# (.+)$', re.MULTILINE)
+H2_PATTERN = re.compile(r'^## (.+)$', re.MULTILINE)
+H3_PATTERN = re.compile(r'^### (.+)$', re.MULTILINE)
+BOLD_PATTERN = re.compile(r'\*\*(.+?)\*\*')
+ITALIC_PATTERN = re.compile(r'\*(.+?)\*')
+LIST_ITEM_PATTERN = re.compile(r'^- (.+)$', re.MULTILINE)
+LIST_RUN_PATTERN = re.compile(r'(<li>.*</li>\n?)+')
+CODE_BLOCK_PATTERN = re.compile(r'```(\w*)\n(.*?)```', re.DOTALL)
+INLINE_CODE_PATTERN = re.compile(r'`(.+?)`')
+
 THEME_CACHE_DIR.mkdir(parents=True, exist_ok=True)
 
 
@@ -124,8 +136,6 @@ def fallback_render_to_html(content: str, theme_id: str | None = None) -> str:
     This provides a basic HTML preview when Marp CLI is not available.
     It parses Marp markdown syntax and generates styled HTML slides.
     """
-    import re
-    
     # Parse Marp front matter
     front_matter = {}
     content_body = content
@@ -140,7 +150,7 @@ def fallback_render_to_html(content: str, theme_id: str | None = None) -> str:
                     front_matter[key.strip()] = val.strip()
     
     # Split into slides (Marp uses --- as slide separator)
-    slides = re.split(r'\n---\n', content_body)
+    slides = content_body.split('\n---\n')
     
     # Generate HTML for each slide
     slide_html_parts = []
@@ -152,21 +162,21 @@ def fallback_render_to_html(content: str, theme_id: str | None = None) -> str:
         slide_html = html_lib.escape(slide_content)
         
         # Headers
-        slide_html = re.sub(r'^# (.+)$', r'<h1>\1</h1>', slide_html, flags=re.MULTILINE)
-        slide_html = re.sub(r'^## (.+)$', r'<h2>\1</h2>', slide_html, flags=re.MULTILINE)
-        slide_html = re.sub(r'^### (.+)$', r'<h3>\1</h3>', slide_html, flags=re.MULTILINE)
+        slide_html = H1_PATTERN.sub(r'<h1>\1</h1>', slide_html)
+        slide_html = H2_PATTERN.sub(r'<h2>\1</h2>', slide_html)
+        slide_html = H3_PATTERN.sub(r'<h3>\1</h3>', slide_html)
         
         # Bold and italic
-        slide_html = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', slide_html)
-        slide_html = re.sub(r'\*(.+?)\*', r'<em>\1</em>', slide_html)
+        slide_html = BOLD_PATTERN.sub(r'<strong>\1</strong>', slide_html)
+        slide_html = ITALIC_PATTERN.sub(r'<em>\1</em>', slide_html)
         
         # Lists
-        slide_html = re.sub(r'^- (.+)$', r'<li>\1</li>', slide_html, flags=re.MULTILINE)
-        slide_html = re.sub(r'(<li>.*</li>\n?)+', r'<ul>\g<0></ul>', slide_html)
+        slide_html = LIST_ITEM_PATTERN.sub(r'<li>\1</li>', slide_html)
+        slide_html = LIST_RUN_PATTERN.sub(r'<ul>\g<0></ul>', slide_html)
         
         # Code blocks
-        slide_html = re.sub(r'```(\w*)\n(.*?)```', r'<pre><code class="\1">\2</code></pre>', slide_html, flags=re.DOTALL)
-        slide_html = re.sub(r'`(.+?)`', r'<code>\1</code>', slide_html)
+        slide_html = CODE_BLOCK_PATTERN.sub(r'<pre><code class="\1">\2</code></pre>', slide_html)
+        slide_html = INLINE_CODE_PATTERN.sub(r'<code>\1</code>', slide_html)
         
         # Line breaks (preserve newlines)
         slide_html = slide_html.replace('\n\n', '</p><p>')
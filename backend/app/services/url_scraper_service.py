@@ -1,56 +1,74 @@
 """URL scraping service for extracting content from links."""
 
 import re
-from typing import Optional
+from typing import Iterable, Optional
 import httpx
 from loguru import logger
 
 
+# Pre-compiled HTML extraction patterns
+SCRIPT_PATTERN = re.compile(r'<script[^>]*>[\s\S]*?</script>', re.IGNORECASE)
+STYLE_PATTERN = re.compile(r'<style[^>]*>[\s\S]*?</style>', re.IGNORECASE)
+TAG_PATTERN = re.compile(r'<[^>]+>')
+WHITESPACE_PATTERN = re.compile(r'\s+')
+TITLE_PATTERN = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+META_DESCRIPTION_PATTERNS = (
+    re.compile(r'<meta[^>]*name=["\']description["\'][^>]*content=["\']([^"\']+)["\']', re.IGNORECASE),
+    re.compile(r'<meta[^>]*content=["\']([^"\']+)["\'][^>]*name=["\']description["\']', re.IGNORECASE),
+)
+OG_PATTERNS = {
+    prop: (
+        re.compile(rf'<meta[^>]*property=["\']og:{prop}["\'][^>]*content=["\']([^"\']+)["\']', re.IGNORECASE),
+        re.compile(rf'<meta[^>]*content=["\']([^"\']+)["\'][^>]*property=["\']og:{prop}["\']', re.IGNORECASE),
+    )
+    for prop in ('title', 'description', 'type', 'site_name')
+}
+MAIN_CONTENT_PATTERNS = tuple(
+    re.compile(selector, re.IGNORECASE)
+    for selector in (r'<article[^>]*>([\s\S]*?)</article>',
+                     r'<main[^>]*>([\s\S]*?)</main>',
+                     r'<div[^>]*class="[^"]*content[^"]*"[^>]*>([\s\S]*?)</div>')
+)
+
+
 def extract_text_from_html(html: str) -> str:
     """Extract readable text from HTML content."""
     # Remove script and style elements
-    html = re.sub(r'<script[^>]*>[\s\S]*?</script>', '', html, flags=re.IGNORECASE)
-    html = re.sub(r'<style[^>]*>[\s\S]*?</style>', '', html, flags=re.IGNORECASE)
+    html = SCRIPT_PATTERN.sub('', html)
+    html = STYLE_PATTERN.sub('', html)
     # Remove HTML tags
-    text = re.sub(r'<[^>]+>', ' ', html)
+    text = TAG_PATTERN.sub(' ', html)
     # Clean up whitespace
-    text = re.sub(r'\s+', ' ', text)
+    text = WHITESPACE_PATTERN.sub(' ', text)
     return text.strip()
 
 
 def extract_title(html: str) -> Optional[str]:
     """Extract page title from HTML."""
-    match = re.search(r'<title[^>]*>(.*?)</title>', html, re.IGNORECASE | re.DOTALL)
+    match = TITLE_PATTERN.search(html)
     return match.group(1).strip() if match else None
 
 
+def _search_first(patterns: Iterable[re.Pattern[str]], text: str) -> re.Match[str] | None:
+    """Return the first match among alternative patterns."""
+    for pattern in patterns:
+        match = pattern.search(text)
+        if match:
+            return match
+    return None
+
+
 def extract_meta_description(html: str) -> Optional[str]:
     """Extract meta description from HTML."""
-    match = re.search(
-        r'<meta[^>]*name=["\']description["\'][^>]*content=["\']([^"\']+)["\']',
-        html, re.IGNORECASE
-    )
-    if not match:
-        match = re.search(
-            r'<meta[^>]*content=["\']([^"\']+)["\'][^>]*name=["\']description["\']',
-            html, re.IGNORECASE
-        )
+    match = _search_first(META_DESCRIPTION_PATTERNS, html)
     return match.group(1).strip() if match else None
 
 
 def extract_og_data(html: str) -> dict:
     """Extract OpenGraph metadata from HTML."""
     og_data = {}
-    for prop in ['title', 'description', 'type', 'site_name']:
-        match = re.search(
-            rf'<meta[^>]*property=["\']og:{prop}["\'][^>]*content=["\']([^"\']+)["\']',
-            html, re.IGNORECASE
-        )
-        if not match:
-            match = re.search(
-                rf'<meta[^>]*content=["\']([^"\']+)["\'][^>]*property=["\']og:{prop}["\']',
-                html, re.IGNORECASE
-            )
+    for prop, patterns in OG_PATTERNS.items():
+        match = _search_first(patterns, html)
         if match:
             og_data[prop] = match.group(1).strip()
     return og_data
@@ -59,13 +77,8 @@ def extract_og_data(html: str) -> dict:
 def extract_main_content(html: str) -> str:
     """Try to extract main content from common article/content tags."""
     # Look for common content containers
-    for selector in ['<article[^>]*>([\s\S]*?)</article>',
-                     '<main[^>]*>([\s\S]*?)</main>',
-                     r'<div[^>]*class="[^"]*content[^"]*"[^>]*>([\s\S]*?)</div>']:
-        match = re.search(selector, html, re.IGNORECASE)
-        if match:
-            return extract_text_from_html(match.group(1))
-    return ""
+    match = _search_first(MAIN_CONTENT_PATTERNS, html)
+    return extract_text_from_html(match.group(1)) if match else ""
 
 
 async def scrape_url(url: str, max_content_length: int = 10000) -> dict:
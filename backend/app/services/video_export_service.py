@@ -16,6 +16,12 @@ from loguru import logger
 from app.services.tts_service import TTSService
 
 
+# Pre-compiled regex patterns for slide parsing
+FRONTMATTER_PATTERN = re.compile(r"^---\n[\s\S]*?\n---\s*")
+SLIDE_BREAK_PATTERN = re.compile(r"\n---\s*\n")
+SLIDE_COMMENT_PATTERN = re.compile(r"<!--\s*(?:slide-comment:)?\s*([\s\S]*?)\s*-->\s*\n?", re.IGNORECASE)
+
+
 class SlideData(TypedDict):
     """Type definition for parsed slide data."""
     index: int
@@ -83,16 +89,16 @@ class VideoExportService:
     def _parse_slides(self, content: str) -> list[SlideData]:
         """Parse markdown content into individual slides."""
         slides: list[SlideData] = []
-        frontmatter_match = re.match(r"^---\n[\s\S]*?\n---\s*", content)
+        frontmatter_match = FRONTMATTER_PATTERN.match(content)
         body = content[frontmatter_match.end():] if frontmatter_match else content
         normalized_body = body.lstrip("\n")
-        slide_parts = re.split(r"\n---\s*\n", normalized_body) if normalized_body else []
+        slide_parts = SLIDE_BREAK_PATTERN.split(normalized_body) if normalized_body else []
 
         for idx, part in enumerate(slide_parts):
             if not part.strip():
                 continue
 
-            comment_match = re.search(r"<!--\s*(?:slide-comment:)?\s*([\s\S]*?)\s*-->\s*\n?", part, re.IGNORECASE)
+            comment_match = SLIDE_COMMENT_PATTERN.search(part)
             comment = comment_match.group(1).strip() if comment_match else ""
             content_only = part
             if comment_match:
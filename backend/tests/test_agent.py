@@ -0,0 +1,50 @@
+"""Tests for the presentation agent and its tool handlers."""
+
+import pytest
+from types import SimpleNamespace
+
+from app.services.ai.agent import TOOL_NAMES, create_agent_tool_handlers
+
+
+DECK = "# Intro\n\n---\n\n# Q3 Revenue\n\n---\n\n# Forecast"
+
+
+@pytest.fixture
+def handlers():
+    """Create tool handlers over an in-memory presentation."""
+    pres = SimpleNamespace(id="p1", title="Deck", theme_id=None, content=DECK)
+    return create_agent_tool_handlers("p1", lambda _pid: pres, lambda _pid, _data: None)
+
+
+class TestSearchPresentation:
+    """Tests for the search_presentation tool."""
+
+    def test_single_query_case_insensitive(self, handlers):
+        """Test a single query matches regardless of case."""
+        result = handlers["search_presentation"]("revenue")
+        assert result["count"] == 1
+        assert result["matches"][0]["slide_index"] == 1
+
+    def test_multiple_queries_single_pass(self, handlers):
+        """Test a list of queries returns slides matching any term."""
+        result = handlers["search_presentation"](["q3", "FORECAST"])
+        assert [m["slide_index"] for m in result["matches"]] == [1, 2]
+
+    def test_query_special_characters_escaped(self, handlers):
+        """Test regex metacharacters in queries are matched literally."""
+        result = handlers["search_presentation"]("Q3 (")
+        assert result["count"] == 0
+
+    @pytest.mark.parametrize("query", ["", [], ["", ""]])
+    def test_empty_query_matches_nothing(self, handlers, query):
+        """Test a search with no terms returns no slides instead of the whole deck."""
+        assert handlers["search_presentation"](query) == {"matches": [], "count": 0}
+
+
+class TestToolHandlers:
+    """Tests for the tool handler dispatch table."""
+
+    def test_handlers_cover_every_tool(self, handlers):
+        """Test each declared tool has a handler keyed by its schema name, in schema order."""
+        assert tuple(handlers) == TOOL_NAMES
+        assert handlers["get_presentation_info"]()["slide_count"] == 3
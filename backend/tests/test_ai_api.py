@@ -6,6 +6,7 @@ from unittest.mock import patch, MagicMock
 from fastapi.testclient import TestClient
 
 from app.main import app
+from app.services.ai.client import BatchError, BatchNotFoundError
 
 
 @pytest.fixture
@@ -145,6 +146,20 @@ class TestGenerateContentEndpoint:
         data = response.json()
         assert data["success"] is False
 
+    def test_generate_content_stream(self, client, mock_ai_service):
+        """Test streamed content is concatenated from service chunks."""
+        mock_ai_service.stream_full_presentation.return_value = iter(["---\nmarp: true\n---\n\n", "# Title"])
+
+        response = client.post("/api/ai/generate-content/stream", json={
+            "outline": {
+                "title": "Test",
+                "slides": [{"title": "S1", "content_points": ["P1"], "notes": ""}]
+            }
+        })
+
+        assert response.status_code == 200
+        assert response.text == "---\nmarp: true\n---\n\n# Title"
+
 
 # =============================================================================
 # GENERATE COMMENTARY ENDPOINT
@@ -181,6 +196,18 @@ class TestGenerateCommentaryEndpoint:
 
         assert response.status_code == 200
 
+    def test_generate_commentary_stream(self, client, mock_ai_service):
+        """Test commentary batches stream as NDJSON lines in completion order."""
+        mock_ai_service.stream_commentary.return_value = iter([(4, ["E"]), (0, ["A", "B", "C", "D"])])
+
+        response = client.post("/api/ai/generate-commentary/stream", json={
+            "slides": [{"content": f"# Slide {i}"} for i in range(5)]
+        })
+
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines == [{"start": 4, "comments": ["E"]}, {"start": 0, "comments": ["A", "B", "C", "D"]}]
+
 
 # =============================================================================
 # SLIDE OPERATION ENDPOINT
@@ -220,6 +247,15 @@ class TestSlideOperationEndpoint:
         assert data["success"] is True
         assert len(data["slides"]) == 2
 
+    def test_slide_operation_split_stream(self, client, mock_ai_service):
+        """Test streamed split emits one NDJSON string per slide."""
+        mock_ai_service.stream_split_slide.return_value = iter(["# Part 1\n- a", "# Part 2"])
+
+        response = client.post("/api/ai/slide-operation/split/stream", json={"content": "# Overloaded"})
+
+        assert response.status_code == 200
+        assert [json.loads(line) for line in response.text.splitlines()] == ["# Part 1\n- a", "# Part 2"]
+
     def test_slide_operation_unknown(self, client, mock_ai_service):
         """Test unknown operation."""
         response = client.post("/api/ai/slide-operation", json={
@@ -387,6 +423,84 @@ class TestRegenerateCommentEndpoints:
         assert len(data["comments"]) == 2
 
 
+# =============================================================================
+# BATCHED REWRITE ENDPOINTS
+# =============================================================================
+
+class TestRewriteBatchEndpoints:
+    """Tests for /api/ai/rewrite-for-topic/batch endpoints."""
+
+    def test_submit_and_collect(self, client, mock_ai_service):
+        """Test a queued rewrite reports processing, then its slides."""
+        mock_ai_service.submit_topic_rewrite.return_value = "batch_1"
+        mock_ai_service.collect_topic_rewrite.side_effect = [None, ["# New"]]
+
+        response = client.post("/api/ai/rewrite-for-topic/batch", json={
+            "slides": ["# Old"], "new_topic": "Space"
+        })
+        assert response.json()["batch_id"] == "batch_1"
+
+        pending = client.post("/api/ai/rewrite-for-topic/batch/batch_1", json={"slides": ["# Old"]}).json()
+        done = client.post("/api/ai/rewrite-for-topic/batch/batch_1", json={"slides": ["# Old"]}).json()
+
+        assert pending["done"] is False
+        assert done["done"] is True and done["slides"] == ["# New"]
+
+    def test_collect_unknown_batch_is_404(self, client, mock_ai_service):
+        """Test an unknown batch id is not reported as still processing."""
+        mock_ai_service.collect_topic_rewrite.side_effect = BatchNotFoundError("nope")
+
+        response = client.post("/api/ai/rewrite-for-topic/batch/nope", json={"slides": ["# Old"]})
+        assert response.status_code == 404
+
+    def test_collect_failure_reports_error(self, client, mock_ai_service):
+        """Test a failed batch lookup answers success=False."""
+        mock_ai_service.collect_topic_rewrite.side_effect = BatchError("down")
+
+        data = client.post("/api/ai/rewrite-for-topic/batch/batch_1", json={"slides": ["# Old"]}).json()
+        assert data["success"] is False and data["done"] is False
+
+    def test_submit_rejects_fresh_rewrite(self, client, mock_ai_service):
+        """Test keep_style=false is rejected rather than silently ignored."""
+        response = client.post("/api/ai/rewrite-for-topic/batch", json={
+            "slides": ["# Old"], "new_topic": "Space", "keep_style": False
+        })
+        assert response.status_code == 400
+        mock_ai_service.submit_topic_rewrite.assert_not_called()
+
+
+# =============================================================================
+# IMAGE JOB ENDPOINTS
+# =============================================================================
+
+class TestImageJobEndpoints:
+    """Tests for /api/ai/generate-image/jobs endpoints."""
+
+    def test_submit_and_poll(self, client, mock_ai_service):
+        """Test a queued image returns a job id and is polled until complete."""
+        mock_ai_service.submit_image.return_value = "job1"
+        mock_ai_service.get_image_job.return_value = ("completed", "aW1n")
+
+        response = client.post("/api/ai/generate-image/jobs", json={"prompt": "A mountain at dawn"})
+        assert response.json() == {"job_id": "job1", "status": "pending", "image_data": None}
+
+        job = client.get("/api/ai/generate-image/jobs/job1").json()
+        assert job["status"] == "completed" and job["image_data"] == "aW1n"
+
+    def test_regenerate_skips_image_cache(self, client, mock_ai_service):
+        """Test regenerate=true asks for a new image instead of the cached one."""
+        mock_ai_service.submit_image.return_value = "job1"
+
+        client.post("/api/ai/generate-image/jobs", json={"prompt": "A mountain at dawn", "regenerate": True})
+        assert mock_ai_service.submit_image.call_args.kwargs == {"use_cache": False}
+
+    def test_unknown_job(self, client, mock_ai_service):
+        """Test polling an unknown job returns 404."""
+        mock_ai_service.get_image_job.return_value = None
+
+        assert client.get("/api/ai/generate-image/jobs/nope").status_code == 404
+
+
 # =============================================================================
 # AI STATUS ENDPOINT
 # =============================================================================
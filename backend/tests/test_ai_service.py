@@ -1,7 +1,11 @@
 """Comprehensive tests for AI service modules."""
 
 import json
+import os
+import threading
+import time
 import pytest
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import MagicMock, patch
 
 from app.services.ai import AIService, SlideOutline, PresentationOutline
@@ -9,17 +13,26 @@ from app.services.ai.client import AIClient
 from app.services.ai.text_utils import (
     extract_json,
     extract_json_array,
+    json_dumps,
     strip_code_fence,
     strip_frontmatter,
     sanitize_markdown,
     fix_broken_comments,
     parse_slide_blocks,
     format_for_audio,
+    iter_slide_blocks,
+    scan_array_objects,
 )
 from app.services.ai.outline_generator import OutlineGenerator
 from app.services.ai.content_generator import ContentGenerator
-from app.services.ai.commentary_generator import CommentaryGenerator
+from app.services.ai.commentary_generator import CommentaryGenerator, BATCH_TTS_RULES
 from app.services.ai.slide_operations import SlideOperations
+from app.services.ai.image_generator import ImageGenerator
+from app.services.ai.theme_generator import ThemeGenerator
+
+
+# Exceeds the viewport's bullet and line limits, so operations reach the model
+OVERLOADED_SLIDE = "# Overloaded slide\n" + "\n".join(f"- Detailed point number {i}" for i in range(14))
 
 
 @pytest.fixture
@@ -79,6 +92,9 @@ class TestTextUtils:
         ('{"title": "Test"}', {"title": "Test"}),
         ('```json\n{"title": "Test"}\n```', {"title": "Test"}),
         ('  {"title": "Test"}  ', {"title": "Test"}),
+        ('{"title": "Test"}\nHope this helps!', {"title": "Test"}),
+        ('Here is the outline:\n```json\n{"title": "Test"}\n```', {"title": "Test"}),
+        ('Here:\n```json\n{"a": {"b": "}"}, "n": 1}\n```\nDone.', {"a": {"b": "}"}, "n": 1}),
     ])
     def test_extract_json_success(self, input_json, expected):
         """Test successful JSON extraction."""
@@ -95,11 +111,48 @@ class TestTextUtils:
         result = extract_json(invalid_input)
         assert result is None
 
+    @pytest.mark.parametrize("input_text,expected", [
+        ('["a", "b"]', ["a", "b"]),
+        ('```json\n["a"]\n```', ["a"]),
+        ('{"a": 1}', None),
+        ("Sure! Here are the comments.", None),
+    ])
+    def test_extract_json_array(self, input_text, expected):
+        """Test array extraction rejects objects and prose."""
+        assert extract_json_array(input_text) == expected
+
+    def test_extract_json_memoized(self):
+        """Test re-parsing an identical reply returns the cached result."""
+        reply = '```json\n{"title": "Cached"}\n```'
+        assert extract_json(reply) is extract_json(reply)
+        assert extract_json_array('["a"]') is extract_json_array('["a"]')
+
     def test_extract_json_none_input(self):
         """Test JSON extraction with None."""
         result = extract_json(None)
         assert result is None
 
+    def test_json_dumps_compact_bytes(self):
+        """Test JSON encoding yields compact UTF-8 bytes with either backend."""
+        assert json_dumps({"start": 0, "comments": ["café"]}) == '{"start":0,"comments":["café"]}'.encode()
+
+    def test_scan_array_objects_incremental(self):
+        """Test array objects are returned only once each has closed."""
+        text = '{"sections": [{"name": "A}", "n": 1}, {"name": "B"'
+        objects, pos = scan_array_objects(text, "sections")
+        assert objects == [{"name": "A}", "n": 1}]
+
+        objects, pos = scan_array_objects(text + "}]}", "sections", pos)
+        assert objects == [{"name": "B"}]
+        assert scan_array_objects(text + "}]}", "sections", pos) == ([], pos)
+
+    def test_scan_array_objects_escaped_strings(self):
+        """Test escaped quotes and braces inside strings do not close an object."""
+        text = r'{"sections": [{"name": "say \"}\" {", "n": 2}, {"name": "open \\"'
+        objects, pos = scan_array_objects(text, "sections")
+        assert objects == [{"name": 'say \"}\" {', "n": 2}]
+        assert scan_array_objects(text, "sections", pos) == ([], pos)
+
     @pytest.mark.parametrize("input_text,expected", [
         ("```markdown\n# Title\n```", "# Title"),
         ("```md\nContent\n```", "Content"),
@@ -111,6 +164,13 @@ class TestTextUtils:
         result = strip_code_fence(input_text)
         assert result == expected
 
+    def test_sanitize_markdown_memoized(self):
+        """Test repeated inputs are served from the sanitize cache."""
+        sanitize_markdown.cache_clear()
+        for _ in range(3):
+            assert sanitize_markdown("```md\n# Title\n```") == "# Title"
+        assert sanitize_markdown.cache_info().hits == 2
+
     @pytest.mark.parametrize("input_text,expected", [
         ("---\nmarp: true\n---\n# Title", "# Title"),
         ("# No Frontmatter", "# No Frontmatter"),
@@ -128,16 +188,53 @@ class TestTextUtils:
         assert len(result) == 3
         assert result[0] == "# Slide 1"
 
+    def test_iter_slide_blocks_across_chunks(self):
+        """Test streamed blocks are emitted once their separator arrives, fences removed."""
+        chunks = ["```markdown\n# A\n- x\n\n-", "--\n\n# B", "\n```"]
+        assert list(iter_slide_blocks(chunks)) == ["# A\n- x", "# B"]
+
+    @pytest.mark.parametrize("reply,expected", [
+        ("# A\n\n---\n\n```python\nx = 1\n```", ["# A", "```python\nx = 1\n```"]),
+        ("```markdown\n```python\nx = 1\n```\n\n---\n\n# B\n```", ["```python\nx = 1\n```", "# B"]),
+        ("---\nmarp: true\n---\n\n# A\n\n---\n\n# B", ["# A", "# B"]),
+        ("```md\n---\nmarp: true\n---\n# A\n```", ["# A"]),
+    ])
+    def test_iter_slide_blocks_matches_sanitized_split(self, reply, expected):
+        """Test code fences inside slides survive and frontmatter is dropped, however the reply is chunked."""
+        assert parse_slide_blocks(sanitize_markdown(reply)) == expected
+        for size in (1, 3, 7, len(reply)):
+            chunks = [reply[i:i + size] for i in range(0, len(reply), size)]
+            assert list(iter_slide_blocks(chunks)) == expected
+
     def test_parse_slide_blocks_empty(self):
         """Test empty slide block parsing."""
         assert parse_slide_blocks("") == []
 
+    @pytest.mark.parametrize("input_text,expected", [
+        ("# Plain slide", "# Plain slide"),
+        ("<!-- <!-- note -->", "<!-- note -->"),
+        ("<!-- note --> -->", "<!-- note -->"),
+        ("# A\n<!-- unclosed", "# A\n<!-- unclosed\n-->"),
+        ("# A\n<!--\n-->", "# A\n"),
+    ])
+    def test_fix_broken_comments(self, input_text, expected):
+        """Test malformed comments are repaired and clean text is untouched."""
+        assert fix_broken_comments(input_text) == expected
+
     @pytest.mark.parametrize("input_text,expected", [
         ("**bold** text", "bold text"),
         ("*italic*", "italic"),
         ("`code`", "code"),
         ("NARRATION: text", "text"),
         ("", ""),
+        ("# Heading\n- **Key**: value\n* star item", "Heading\nKey: value\nstar item"),
+        ("# - nested", "nested"),
+        ("**Narration:** label", "label"),
+        ("**----->", "*----->"),
+        ("`*x*`", "x"),
+        ("*unclosed word", "unclosed word"),
+        ("Revenue grew - as planned - to 5 * 3 million.", "Revenue grew - as planned - to 5 * 3 million."),
+        ("Narration: plain prose", "plain prose"),
     ])
     def test_format_for_audio(self, input_text, expected):
         """Test audio formatting."""
@@ -158,6 +255,16 @@ class TestAIClient:
             client = AIClient()
             assert client.is_available is False
 
+    def test_client_retries_transient_errors(self):
+        """Test the SDK retry budget is configurable."""
+        with patch.dict('os.environ', {
+            'AZURE_ENDPOINT': 'https://test.openai.azure.com',
+            'API_KEY': 'test-key',
+            'AI_MAX_RETRIES': '5'
+        }):
+            client = AIClient()
+        assert client.client.max_retries == 5
+
     def test_call_success(self, ai_client, mock_anthropic_client):
         """Test successful AI call."""
         result = ai_client.call("Test prompt", max_tokens=100)
@@ -175,6 +282,180 @@ class TestAIClient:
         result = ai_client.call("Test prompt")
         assert result is None
 
+    def test_call_reuses_cached_response(self, ai_client, mock_anthropic_client):
+        """Test identical prompts are served from the response cache."""
+        assert ai_client.call("Same prompt") == "Test response"
+        assert ai_client.call("Same prompt") == "Test response"
+        assert mock_anthropic_client.messages.create.call_count == 1
+
+    def test_call_without_cache_always_requests(self, ai_client, mock_anthropic_client):
+        """Test use_cache=False skips cached and coalesced responses."""
+        assert ai_client.call("Same prompt") == "Test response"
+        mock_anthropic_client.messages.create.return_value.content[0].text = "Fresh"
+
+        assert ai_client.call("Same prompt", use_cache=False) == "Fresh"
+        assert ai_client.call("Same prompt", use_cache=False) == "Fresh"
+        assert mock_anthropic_client.messages.create.call_count == 3
+
+    def test_call_does_not_cache_failures(self, ai_client, mock_anthropic_client):
+        """Test failed requests are retried on the next call."""
+        mock_anthropic_client.messages.create.return_value.content = []
+        assert ai_client.call("Same prompt") is None
+        assert ai_client.call("Same prompt") is None
+        assert mock_anthropic_client.messages.create.call_count == 2
+
+    def test_call_coalesces_concurrent_identical_prompts(self, ai_client, mock_anthropic_client):
+        """Test identical prompts in flight at once share a single request."""
+        release = threading.Event()
+
+        def respond(**kwargs):
+            release.wait(timeout=5)
+            return MagicMock(content=[MagicMock(text="Shared")])
+
+        mock_anthropic_client.messages.create.side_effect = respond
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            futures = [pool.submit(ai_client.call, "Simplify") for _ in range(3)]
+            while not ai_client._inflight:
+                time.sleep(0.01)
+            time.sleep(0.05)
+            release.set()
+            results = [f.result() for f in futures]
+
+        assert results == ["Shared"] * 3
+        assert mock_anthropic_client.messages.create.call_count == 1
+        assert not ai_client._inflight
+
+    def test_call_uses_shared_cache(self, ai_client, mock_anthropic_client):
+        """Test the cross-process cache is read before and written after a request."""
+        shared = MagicMock()
+        shared.get.side_effect = [None, "From another worker"]
+        ai_client._shared_cache = shared
+
+        assert ai_client.call("Prompt A", shared=True) == "Test response"
+        key, ttl, value = shared.setex.call_args.args
+        assert key.startswith("ai:") and ttl == 7 * 24 * 3600 and value == "Test response"
+
+        assert ai_client.call("Prompt B", shared=True) == "From another worker"
+        assert mock_anthropic_client.messages.create.call_count == 1
+
+    @pytest.mark.parametrize("options", [{}, {"shared": True, "use_cache": False}])
+    def test_call_skips_shared_cache_unless_opted_in(self, ai_client, mock_anthropic_client, options):
+        """Test only shared, cacheable calls touch the cross-process cache."""
+        ai_client._shared_cache = MagicMock()
+
+        assert ai_client.call("Prompt", **options) == "Test response"
+        ai_client._shared_cache.get.assert_not_called()
+        ai_client._shared_cache.setex.assert_not_called()
+
+    def test_shared_cache_url_without_redis_warns(self):
+        """Test a configured Redis URL is reported when the package is missing."""
+        from app.core import cache
+
+        with patch.object(cache, "redis", None), patch.object(cache.logger, "warning") as warning:
+            assert cache.create_shared_ai_cache("redis://localhost:6379/0") is None
+            assert cache.create_shared_ai_cache(None) is None
+
+        warning.assert_called_once()
+        assert "AI_CACHE_REDIS_URL" in warning.call_args.args[0]
+
+    def test_call_survives_shared_cache_errors(self, ai_client, mock_anthropic_client):
+        """Test an unreachable shared cache never fails the request."""
+        ai_client._shared_cache = MagicMock()
+        ai_client._shared_cache.get.side_effect = ConnectionError("down")
+        ai_client._shared_cache.setex.side_effect = ConnectionError("down")
+
+        assert ai_client.call("Prompt", shared=True) == "Test response"
+
+    def test_call_many_preserves_order(self, ai_client, mock_anthropic_client):
+        """Test concurrent calls return results in prompt order."""
+        def respond(**kwargs):
+            response = MagicMock()
+            response.content = [MagicMock(text=kwargs["messages"][0]["content"].upper())]
+            return response
+
+        mock_anthropic_client.messages.create.side_effect = respond
+        result = ai_client.call_many(["a", "b", "c", "d", "e"])
+        assert result == ["A", "B", "C", "D", "E"]
+
+    def test_call_many_per_prompt_max_tokens(self, ai_client, mock_anthropic_client):
+        """Test a list of max_tokens applies one limit per prompt."""
+        def respond(**kwargs):
+            return MagicMock(content=[MagicMock(text=str(kwargs["max_tokens"]))])
+
+        mock_anthropic_client.messages.create.side_effect = respond
+        assert ai_client.call_many(["a", "b"], max_tokens=[100, 200]) == ["100", "200"]
+
+    def test_warm_up_sends_single_token_request(self, ai_client, mock_anthropic_client):
+        """Test warm-up primes the client with a minimal request."""
+        ai_client.warm_up()
+        kwargs = mock_anthropic_client.messages.create.call_args.kwargs
+        assert kwargs["max_tokens"] == 1
+
+    def test_close_releases_pooled_connections(self, ai_client, mock_anthropic_client):
+        """Test close shuts the shared HTTP pool."""
+        ai_client.close()
+        mock_anthropic_client.close.assert_called_once()
+
+    def test_http_pool_sized_for_concurrency(self):
+        """Test the Anthropic client is built on one pooled HTTP client."""
+        env = {"AZURE_ENDPOINT": "https://test.openai.azure.com", "API_KEY": "test-key"}
+        with patch.dict("os.environ", env), \
+                patch("app.services.ai.client.httpx.Client") as client_cls, \
+                patch("app.services.ai.client.Anthropic") as anthropic_cls:
+            AIClient()
+
+        limits = client_cls.call_args.kwargs["limits"]
+        assert limits.max_connections == 100 and limits.max_keepalive_connections == 50
+        assert limits.keepalive_expiry == 60
+        assert anthropic_cls.call_args.kwargs["http_client"] is client_cls.return_value
+
+    def test_rate_limit_paces_requests(self, ai_client, mock_anthropic_client):
+        """Test each model request takes a token from the rate limiter."""
+        ai_client._rate_limit = MagicMock()
+        ai_client.call_many(["a", "b", "c"])
+        assert ai_client._rate_limit.acquire.call_count == 3
+
+    def test_token_bucket_blocks_when_empty(self):
+        """Test the bucket allows a burst, then waits for a refill."""
+        from app.core.rate_limiter import TokenBucket
+
+        bucket = TokenBucket(2, period=0.1)
+        start = time.monotonic()
+        for _ in range(3):
+            bucket.acquire()
+        assert time.monotonic() - start >= 0.04
+
+    def test_token_bucket_rejects_zero_rate(self):
+        """Test a bucket that could never refill is rejected up front."""
+        from app.core.rate_limiter import TokenBucket
+
+        with pytest.raises(ValueError):
+            TokenBucket(0)
+
+    def test_zero_max_rpm_disables_rate_limit(self, mock_anthropic_client):
+        """Test AI_MAX_RPM=0 means unlimited instead of dividing by zero."""
+        with patch.dict('os.environ', {
+            'AZURE_ENDPOINT': 'https://test.openai.azure.com',
+            'API_KEY': 'test-key',
+            'AI_MAX_RPM': '0'
+        }):
+            client = AIClient()
+        client.client = mock_anthropic_client
+
+        assert client._rate_limit is None
+        assert client.call("prompt") == "Test response"
+
+    def test_warm_up_swallows_errors(self, ai_client, mock_anthropic_client):
+        """Test warm-up failures never propagate."""
+        mock_anthropic_client.messages.create.side_effect = Exception("Error")
+        ai_client.warm_up()
+
+    def test_warm_up_is_rate_limited(self, ai_client, mock_anthropic_client):
+        """Test warm-up takes a rate-limit token like any other model request."""
+        ai_client._rate_limit = MagicMock()
+        ai_client.warm_up()
+        ai_client._rate_limit.acquire.assert_called_once()
+
 
 class TestOutlineGenerator:
     """Tests for outline generation."""
@@ -201,6 +482,88 @@ class TestOutlineGenerator:
         result = generator.generate("Test topic")
         assert result is None
 
+    def test_generate_outline_wrong_shape(self, ai_client, mock_anthropic_client):
+        """Test JSON that is not a valid outline is rejected."""
+        mock_anthropic_client.messages.create.return_value.content[0].text = json.dumps({"title": "No slides"})
+
+        result = OutlineGenerator(ai_client).generate("Test topic")
+        assert result is None
+
+    def test_parse_section_slides_validates_in_bulk(self, ai_client):
+        """Test section slides are validated together and bad payloads dropped."""
+        generator = OutlineGenerator(ai_client)
+        good = json.dumps({"slides": [{"title": "A", "content_points": ["x"]}]})
+        bad = json.dumps({"slides": [{"content_points": ["x"]}]})
+
+        assert generator._parse_section_slides(good) == [SlideOutline(title="A", content_points=["x"])]
+        assert generator._parse_section_slides(bad) == []
+
+    def test_generate_batched_outline_keeps_section_order(self, ai_client, mock_anthropic_client):
+        """Test large outlines merge concurrently generated sections in order."""
+        structure = {"title": "Big Deck", "sections": [
+            {"name": f"Part {i}", "slide_count": 1, "topics": []} for i in range(4)
+        ]}
+
+        def respond(**kwargs):
+            prompt = kwargs["messages"][0]["content"]
+            if prompt.startswith("Create structure"):
+                text = json.dumps(structure)
+            else:
+                name = prompt.split("Section: ")[1].split("\n")[0]
+                text = json.dumps({"title": "x", "slides": [{"title": name, "content_points": []}]})
+            return MagicMock(content=[MagicMock(text=text)])
+
+        mock_anthropic_client.messages.create.side_effect = respond
+        result = OutlineGenerator(ai_client).generate("Topic", slide_count=20)
+
+        assert result.title == "Big Deck"
+        assert [s.title for s in result.slides] == ["Part 0", "Part 1", "Part 2", "Part 3"]
+
+    def test_generate_batched_outline_dispatches_sections_while_streaming(self, ai_client, mock_anthropic_client):
+        """Test section requests start before the structure stream finishes."""
+        first_dispatched = threading.Event()
+
+        def respond(**kwargs):
+            name = kwargs["messages"][0]["content"].split("Section: ")[1].split("\n")[0]
+            first_dispatched.set()
+            slides = [{"title": name, "content_points": []}]
+            return MagicMock(content=[MagicMock(text=json.dumps({"slides": slides}))])
+
+        def chunks():
+            yield '{"title": "Streamed", "sections": [{"name": "Part 0", "slide_count": 1}'
+            assert first_dispatched.wait(timeout=5)
+            yield ', {"name": "Part 1", "slide_count": 1}]}'
+
+        stream = mock_anthropic_client.messages.stream.return_value.__enter__.return_value
+        stream.text_stream = chunks()
+        mock_anthropic_client.messages.create.side_effect = respond
+        result = OutlineGenerator(ai_client).generate("Topic", slide_count=20)
+
+        assert result.title == "Streamed"
+        assert [s.title for s in result.slides] == ["Part 0", "Part 1"]
+        assert mock_anthropic_client.messages.stream.call_count == 1
+
+    def test_generate_batched_outline_retries_unparseable_stream(self, ai_client, mock_anthropic_client):
+        """Test a truncated structure stream falls back to a single structure request."""
+        structure = {"title": "Retried", "sections": [{"name": "Part 0", "slide_count": 1, "topics": []}]}
+
+        def respond(**kwargs):
+            prompt = kwargs["messages"][0]["content"]
+            if prompt.startswith("Create structure"):
+                return MagicMock(content=[MagicMock(text=json.dumps(structure))])
+            name = prompt.split("Section: ")[1].split("\n")[0]
+            slides = [{"title": name, "content_points": []}]
+            return MagicMock(content=[MagicMock(text=json.dumps({"slides": slides}))])
+
+        stream = mock_anthropic_client.messages.stream.return_value.__enter__.return_value
+        stream.text_stream = iter(['{"title": "Cut", "sections": [{"name": "Stale", "slide_count": 1}, {"name": "Cu'])
+        mock_anthropic_client.messages.create.side_effect = respond
+        result = OutlineGenerator(ai_client).generate("Topic", slide_count=20)
+
+        # The section dispatched from the truncated stream is dropped, not merged
+        assert result.title == "Retried"
+        assert [s.title for s in result.slides] == ["Part 0"]
+
 
 class TestContentGenerator:
     """Tests for content generation."""
@@ -215,6 +578,57 @@ class TestContentGenerator:
         assert "marp: true" in result
         assert "Test Presentation" in result
 
+    def test_generate_batches_keep_slide_order(self, ai_client, mock_anthropic_client):
+        """Test concurrently generated batches are assembled in outline order."""
+        def respond(**kwargs):
+            prompt = kwargs["messages"][0]["content"]
+            first = prompt.split("Slide 1: ")[1].split("\n")[0]
+            return MagicMock(content=[MagicMock(text=f"# {first}")])
+
+        mock_anthropic_client.messages.create.side_effect = respond
+        outline = PresentationOutline(title="Deck", slides=[
+            SlideOutline(title=f"Topic {i}", content_points=["p"]) for i in range(12)
+        ])
+        result = ContentGenerator(ai_client).generate(outline)
+
+        assert result.index("# Topic 0") < result.index("# Topic 4") < result.index("# Topic 8")
+
+    @pytest.mark.parametrize("count,sizes", [
+        (0, [0]),
+        (3, [3]),
+        (4, [4]),
+        (5, [3, 2]),
+        (6, [3, 3]),
+        (9, [3, 3, 3]),
+        (13, [4, 3, 3, 3]),
+    ])
+    def test_split_batches_evenly_sized(self, ai_client, count, sizes):
+        """Test slides use the fewest batches with sizes differing by at most one."""
+        slides = [SlideOutline(title=f"Topic {i}", content_points=["p"]) for i in range(count)]
+
+        batches = ContentGenerator(ai_client)._split_batches(slides)
+
+        assert [len(b) for b in batches] == sizes
+        assert [s for b in batches for s in b] == slides
+
+    def test_generate_stream_yields_frontmatter_first(self, ai_client, mock_anthropic_client, sample_outline):
+        """Test streaming starts with frontmatter and matches the joined output."""
+        mock_anthropic_client.messages.create.return_value.content[0].text = "# Generated"
+
+        generator = ContentGenerator(ai_client)
+        chunks = list(generator.generate_stream(sample_outline))
+
+        assert chunks[0].startswith("---\nmarp: true")
+        assert "".join(chunks) == generator.generate(sample_outline)
+
+    def test_generate_falls_back_per_failed_batch(self, ai_client, mock_anthropic_client, sample_outline):
+        """Test a failed batch is replaced by outline-based fallback content."""
+        mock_anthropic_client.messages.create.side_effect = Exception("Error")
+
+        result = ContentGenerator(ai_client).generate(sample_outline)
+
+        assert "# Main Topic\n\n- Detail A" in result
+
     def test_viewport_constraints_defined(self, ai_client):
         """Test viewport constraints are set."""
         generator = ContentGenerator(ai_client)
@@ -236,6 +650,92 @@ class TestCommentaryGenerator:
 
         assert len(result) == 2
 
+    def test_generate_all_multiple_batches(self, ai_client, mock_anthropic_client):
+        """Test every batch contributes comments in slide order."""
+        def respond(**kwargs):
+            count = kwargs["messages"][0]["content"].count("[Slide ")
+            return MagicMock(content=[MagicMock(text=json.dumps(["C"] * count))])
+
+        mock_anthropic_client.messages.create.side_effect = respond
+        generator = CommentaryGenerator(ai_client)
+        slides = [{"content": f"# Slide {i}"} for i in range(10)]
+        result = generator.generate_all(slides)
+
+        assert mock_anthropic_client.messages.create.call_count == 2
+        assert result == ["C"] * 10
+        budgets = sorted(c.kwargs["max_tokens"] for c in mock_anthropic_client.messages.create.call_args_list)
+        assert budgets == [550, 1750]
+
+    def test_batches_packed_by_estimated_tokens(self, ai_client):
+        """Test long slides close a batch before the slide cap is reached."""
+        generator = CommentaryGenerator(ai_client)
+        slides = [{"content": "x" * 30000}, {"content": "x" * 30000}, {"content": "short"}]
+
+        starts, batches = generator._pack(slides)
+
+        assert starts == [0, 1]
+        assert [len(b) for b in batches] == [1, 2]
+
+    def test_generate_all_retries_mismatched_batch_per_slide(self, ai_client, mock_anthropic_client):
+        """Test a batch reply with the wrong count falls back to single-slide requests."""
+        def respond(**kwargs):
+            text = json.dumps(["Only one"]) if kwargs["max_tokens"] != 200 else "Single"
+            return MagicMock(content=[MagicMock(text=text)])
+
+        mock_anthropic_client.messages.create.side_effect = respond
+        result = CommentaryGenerator(ai_client).generate_all([{"content": "# A"}, {"content": "# B"}])
+
+        assert result == ["Single", "Single"]
+        assert mock_anthropic_client.messages.create.call_count == 3
+
+    def test_generate_all_deduplicates_identical_slides(self, ai_client, mock_anthropic_client):
+        """Test duplicate slides are requested once and share their comment."""
+        mock_anthropic_client.messages.create.return_value.content[0].text = json.dumps(["A", "B"])
+
+        generator = CommentaryGenerator(ai_client)
+        slides = [{"content": "# Agenda"}, {"content": "# Agenda"}, {"content": "# Demo"}]
+        result = generator.generate_all(slides)
+
+        assert mock_anthropic_client.messages.create.call_count == 1
+        prompt = mock_anthropic_client.messages.create.call_args.kwargs["messages"][0]["content"]
+        assert prompt.count("# Agenda") == 1
+        # Prompt numbering follows the deck, not the deduplicated list
+        assert "[Slide 1]\n# Agenda" in prompt
+        assert "[Slide 3]\n# Demo" in prompt
+        assert result == ["A", "A", "B"]
+
+    def test_iter_commentary_yields_each_batch(self, ai_client, mock_anthropic_client):
+        """Test streamed batches carry their start index and one comment per slide."""
+        def respond(**kwargs):
+            count = kwargs["messages"][0]["content"].count("[Slide ")
+            return MagicMock(content=[MagicMock(text=json.dumps(["C"] * count))])
+
+        mock_anthropic_client.messages.create.side_effect = respond
+
+        generator = CommentaryGenerator(ai_client)
+        generator.batch_size = 4
+        slides = [{"content": f"# Slide {i}"} for i in range(6)]
+        batches = dict(generator.iter_commentary(slides))
+
+        assert batches == {0: ["C"] * 4, 4: ["C", "C"]}
+
+    def test_build_context_caps_neighbours(self, ai_client):
+        """Test neighbouring slides are capped to their nearest characters."""
+        generator = CommentaryGenerator(ai_client)
+        context = generator._build_context("a" * 250 + "END", "START" + "b" * 250)
+
+        before, after = context.split("\n")
+        assert before == "Previous slide: " + "a" * 197 + "END"
+        assert after == "Next slide: START" + "b" * 195
+
+    def test_batch_prompt_leads_with_fixed_rules(self, ai_client):
+        """Test the static TTS rules prefix every batch prompt."""
+        generator = CommentaryGenerator(ai_client)
+        prompt = generator._create_batch_prompt([{"content": "# Slide"}], "casual", [1])
+
+        assert prompt.startswith(BATCH_TTS_RULES)
+        assert prompt.endswith("[Slide 1]\n# Slide")
+
     def test_generate_single_commentary(self, ai_client, mock_anthropic_client):
         """Test single slide commentary."""
         mock_anthropic_client.messages.create.return_value.content[0].text = "This explains the content."
@@ -263,19 +763,94 @@ class TestSlideOperations:
         mock_anthropic_client.messages.create.return_value.content[0].text = "# Simple"
 
         ops = SlideOperations(ai_client)
-        result = ops.simplify("# Complex content")
+        result = ops.simplify(OVERLOADED_SLIDE)
 
         assert result == "# Simple"
 
     def test_split(self, ai_client, mock_anthropic_client):
-        """Test slide splitting."""
+        """Test slide splitting uses a single model call."""
         mock_anthropic_client.messages.create.return_value.content[0].text = "# Part 1\n\n---\n\n# Part 2"
 
         ops = SlideOperations(ai_client)
-        result = ops.split("# Overloaded slide")
+        result = ops.split(OVERLOADED_SLIDE)
 
-        assert isinstance(result, list)
-        assert len(result) == 2
+        assert result == ["# Part 1", "# Part 2"]
+        mock_anthropic_client.messages.create.assert_called_once()
+
+    @pytest.mark.parametrize("content,keeps_diagram", [
+        ('<div class="flow-horizontal">A</div>', True),
+        ('<div class="columns-2">A</div>', True),
+        ("# Plain bullets\n- One", False),
+    ])
+    def test_split_diagram_detection(self, ai_client, mock_anthropic_client, content, keeps_diagram):
+        """Test diagram classes add the keep-diagram-intact instruction."""
+        mock_anthropic_client.messages.create.return_value.content[0].text = "# A\n\n---\n\n# B"
+        SlideOperations(ai_client).split(content + "\n" + OVERLOADED_SLIDE)
+
+        prompts = [c.kwargs["messages"][0]["content"] for c in mock_anthropic_client.messages.create.call_args_list]
+        assert any("Keep the entire HTML diagram" in p for p in prompts) == keeps_diagram
+
+    def test_split_stream_yields_blocks(self, ai_client, mock_anthropic_client):
+        """Test streamed splits yield each slide, or the original if nothing arrives."""
+        ops = SlideOperations(ai_client)
+        assert list(ops.split_stream(OVERLOADED_SLIDE)) == [OVERLOADED_SLIDE]
+
+        stream = mock_anthropic_client.messages.stream.return_value.__enter__.return_value
+        stream.text_stream = iter(["# Part 1\n\n---", "\n\n# Part 2"])
+        assert list(ops.split_stream(OVERLOADED_SLIDE)) == ["# Part 1", "# Part 2"]
+
+    def test_split_stream_paced_without_holding_slot(self, ai_client, mock_anthropic_client):
+        """Test a streamed split is paced but a stalled consumer does not block calls."""
+        ai_client._rate_limit = MagicMock()
+        ai_client._call_slots = threading.BoundedSemaphore(1)
+        stream = mock_anthropic_client.messages.stream.return_value.__enter__.return_value
+        stream.text_stream = iter(["# Part 1\n\n---\n\n", "# Part 2"])
+
+        blocks = SlideOperations(ai_client).split_stream(OVERLOADED_SLIDE)
+        assert next(blocks) == "# Part 1"
+        # The consumer stalls mid-stream; a regular call still gets the only slot
+        assert ai_client.call("prompt", use_cache=False) == "Test response"
+        assert list(blocks) == ["# Part 2"]
+
+        assert ai_client._rate_limit.acquire.call_count == 2
+        mock_anthropic_client.messages.stream.return_value.__exit__.assert_called_once()
+
+    def test_small_slides_skip_the_model(self, ai_client, mock_anthropic_client):
+        """Test slides already within the limits are not sent for simplify or split."""
+        ops = SlideOperations(ai_client)
+        small = "# Small slide\n- One\n- Two"
+
+        assert ops.simplify(small) == small
+        assert ops.split(small) == [small]
+        assert list(ops.split_stream(small)) == [small]
+        mock_anthropic_client.messages.create.assert_not_called()
+        mock_anthropic_client.messages.stream.assert_not_called()
+
+    def test_simplify_long_bullet_reaches_model(self, ai_client, mock_anthropic_client):
+        """Test a few bullets still get simplified when one is over the char limit."""
+        mock_anthropic_client.messages.create.return_value.content[0].text = "# Simple"
+        content = "# Slide\n- " + "word " * 20
+
+        assert SlideOperations(ai_client).simplify(content) == "# Simple"
+
+    def test_simplify_dense_prose_reaches_model(self, ai_client, mock_anthropic_client):
+        """Test a paragraph of short lines without bullets is still simplified."""
+        mock_anthropic_client.messages.create.return_value.content[0].text = "# Simple"
+        content = "# Slide\n" + "\n".join(["This sentence carries another detail about the topic."] * 5)
+
+        assert SlideOperations(ai_client).simplify(content) == "# Simple"
+
+    def test_repeated_operations_served_from_cache(self, ai_client, mock_anthropic_client):
+        """Test deterministic operations reuse the response while restyle re-runs ask again."""
+        mock_anthropic_client.messages.create.return_value.content[0].text = "# Done"
+
+        ops = SlideOperations(ai_client)
+        for _ in range(3):
+            ops.simplify(OVERLOADED_SLIDE)
+        ops.restyle("# Slide", "modern")
+        ops.restyle("# Slide", "modern")
+
+        assert mock_anthropic_client.messages.create.call_count == 3
 
 
 class TestAIServiceIntegration:
@@ -304,6 +879,15 @@ class TestAIServiceIntegration:
             assert result is not None
             assert result.title == "Test"
 
+    def test_components_built_on_first_use(self, ai_client):
+        """Test generators are created lazily, once, around the service client."""
+        service = AIService(ai_client)
+        assert "_images" not in vars(service)
+
+        assert service._slides is service._slides
+        assert service._slides.client is ai_client
+        assert "_images" not in vars(service)
+
     def test_slide_operations_through_service(self, ai_client, mock_anthropic_client):
         """Test slide operations via main service."""
         mock_anthropic_client.messages.create.return_value.content[0].text = "# Result"
@@ -318,3 +902,176 @@ class TestAIServiceIntegration:
 
             assert service.rewrite_slide("# Test", "improve") is not None
             assert service.simplify_slide("# Test") is not None
+
+    def test_regenerate_comments_bypass_cache(self, ai_client, mock_anthropic_client):
+        """Test regenerating a comment asks the model again instead of reusing the last reply."""
+        mock_anthropic_client.messages.create.return_value.content[0].text = "First take."
+        service = AIService(ai_client)
+        assert service.regenerate_comment("# Slide") == "First take."
+
+        mock_anthropic_client.messages.create.return_value.content[0].text = "Second take."
+        assert service.regenerate_comment("# Slide") == "Second take."
+
+        mock_anthropic_client.messages.create.return_value.content[0].text = '["Batch take."]'
+        service.regenerate_all_comments([{"content": "# Slide"}])
+        assert service.regenerate_all_comments([{"content": "# Slide"}]) == ["Batch take."]
+        assert mock_anthropic_client.messages.create.call_count == 4
+
+
+class TestImageGenerator:
+    """Tests for image generation."""
+
+    def test_generate_reuses_pooled_client(self):
+        """Test repeated generations share one HTTP client."""
+        generator = ImageGenerator("https://test.openai.azure.com", "test-key", "dall-e-3")
+        response = MagicMock()
+        response.json.return_value = {"data": [{"b64_json": "aGk="}]}
+
+        with patch("app.services.ai.image_generator.httpx.Client") as client_cls:
+            client_cls.return_value.post.return_value = response
+            assert generator.generate("a cat") == "aGk="
+            assert generator.generate("a dog") == "aGk="
+
+        client_cls.assert_called_once()
+        assert client_cls.return_value.post.call_count == 2
+
+    def test_generate_served_from_disk_cache(self, tmp_path):
+        """Test identical requests reuse the cached image; other sizes do not."""
+        generator = ImageGenerator("https://test.openai.azure.com", "test-key", "dall-e-3", cache_dir=tmp_path)
+        response = MagicMock()
+        response.json.return_value = {"data": [{"b64_json": "aGk="}]}
+
+        with patch("app.services.ai.image_generator.httpx.Client") as client_cls:
+            client_cls.return_value.post.return_value = response
+            assert generator.generate("a cat") == "aGk="
+            assert generator.generate("a cat") == "aGk="
+            assert generator.generate("a cat", size="512x512") == "aGk="
+
+        assert client_cls.return_value.post.call_count == 2
+        assert len(list(tmp_path.glob("*.png"))) == 2
+
+    def test_generate_without_cache_replaces_cached_image(self, tmp_path):
+        """Test use_cache=False always requests a new image and caches it in place of the old one."""
+        generator = ImageGenerator("https://test.openai.azure.com", "test-key", "dall-e-3", cache_dir=tmp_path)
+        first, second = MagicMock(), MagicMock()
+        first.json.return_value = {"data": [{"b64_json": "aGk="}]}
+        second.json.return_value = {"data": [{"b64_json": "eW8="}]}
+
+        with patch("app.services.ai.image_generator.httpx.Client") as client_cls:
+            client_cls.return_value.post.side_effect = [first, second]
+            assert generator.generate("a cat") == "aGk="
+            assert generator.generate("a cat", use_cache=False) == "eW8="
+            assert generator.generate("a cat") == "eW8="
+
+        assert client_cls.return_value.post.call_count == 2
+
+    def test_expired_cache_entries_deleted(self, tmp_path):
+        """Test expired images are removed on read and swept when another image is written."""
+        generator = ImageGenerator("https://test.openai.azure.com", "test-key", "dall-e-3", cache_dir=tmp_path)
+        stale = time.time() - generator.CACHE_TTL - 1
+        for name in ("a cat", "a dog"):
+            path = generator._cache_path(name, "1024x1024", "standard")
+            path.write_bytes(b"old")
+            os.utime(path, (stale, stale))
+
+        assert generator._read_cache(generator._cache_path("a cat", "1024x1024", "standard")) is None
+        assert len(list(tmp_path.glob("*.png"))) == 1
+
+        generator._write_cache(generator._cache_path("a bird", "1024x1024", "standard"), "aGk=")
+        assert [p.name for p in tmp_path.glob("*.png")] == [generator._cache_path("a bird", "1024x1024", "standard").name]
+
+    def test_close_releases_client_and_jobs(self):
+        """Test close shuts the job pool and the pooled client, which is rebuilt on next use."""
+        generator = ImageGenerator("https://test.openai.azure.com", "test-key", "dall-e-3")
+
+        with patch("app.services.ai.image_generator.httpx.Client") as client_cls, \
+                patch.object(generator, "generate", return_value="aW1n"):
+            first = generator._http()
+            assert generator._http() is first
+            generator.submit("A lake")
+            generator.close()
+
+            first.close.assert_called_once()
+            assert generator._executor is None
+            generator._http()
+            assert client_cls.call_count == 2
+
+    def test_submit_runs_in_background(self):
+        """Test submitted images are generated off the request path and polled by job id."""
+        generator = ImageGenerator("https://test.openai.azure.com", "test-key", "dall-e-3")
+        release = threading.Event()
+
+        def generate(*args):
+            release.wait(timeout=5)
+            return "aW1n"
+
+        with patch.object(generator, "generate", side_effect=generate):
+            job_id = generator.submit("A mountain at dawn")
+            assert generator.get_job(job_id) == ("pending", None)
+            release.set()
+            generator._executor.shutdown(wait=True)
+
+        assert generator.get_job(job_id) == ("completed", "aW1n")
+        assert generator.get_job("missing") is None
+
+    def test_concurrent_first_submits_share_one_pool(self):
+        """Test racing first submits create a single job pool that close() then shuts down."""
+        generator = ImageGenerator("https://test.openai.azure.com", "test-key", "dall-e-3")
+        start = threading.Barrier(8)
+
+        def submit(i):
+            start.wait(timeout=5)
+            generator.submit(f"Prompt {i}")
+
+        with patch("app.services.ai.image_generator.ThreadPoolExecutor", wraps=ThreadPoolExecutor) as pool_cls, \
+                patch.object(generator, "generate", return_value="aW1n"):
+            threads = [threading.Thread(target=submit, args=(i,)) for i in range(8)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            generator.close()
+
+        assert pool_cls.call_count == 1
+        assert generator._executor is None
+
+    def test_jobs_cancelled_by_close_report_failed(self):
+        """Test a job still queued at close() polls as failed instead of raising."""
+        generator = ImageGenerator("https://test.openai.azure.com", "test-key", "dall-e-3")
+        release = threading.Event()
+
+        def generate(*args):
+            release.wait(timeout=5)
+            return "aW1n"
+
+        with patch.object(generator, "generate", side_effect=generate):
+            job_ids = [generator.submit(f"Prompt {i}") for i in range(generator.JOB_WORKERS + 1)]
+            generator.close()
+            release.set()
+
+        assert generator.get_job(job_ids[-1]) == ("failed", None)
+
+
+class TestThemeGenerator:
+    """Tests for theme CSS generation."""
+
+    def test_generate_builds_prompt_from_colors(self, ai_client, mock_anthropic_client):
+        """Test brand colors are listed in the prompt and the prompt is memoized."""
+        mock_anthropic_client.messages.create.return_value.content[0].text = ":root { --primary: #123456; }"
+        generator = ThemeGenerator(ai_client)
+
+        assert generator.generate("Brand", ["#123456", "#abcdef"], "minimal") == ":root { --primary: #123456; }"
+        prompt = mock_anthropic_client.messages.create.call_args.kwargs["messages"][0]["content"]
+        assert "Color 1: #123456\nColor 2: #abcdef" in prompt
+        assert "Theme: Brand\nStyle: minimal" in prompt
+        assert generator._create_prompt("Brand", ("#123456", "#abcdef"), "minimal") is prompt
+
+    @pytest.mark.parametrize("content,expected", [
+        ("```css\nsection { color: red; }\n```", "section { color: red; }"),
+        ("section { color: red; }", "section { color: red; }"),
+        ("```css\nsection {\n  color: red;", "section {\n  color: red;"),
+        ("```", "```"),
+    ])
+    def test_clean_css_strips_fences(self, ai_client, content, expected):
+        """Test fenced CSS is unwrapped, including replies missing the closing fence."""
+        assert ThemeGenerator(ai_client)._clean_css(content) == expected
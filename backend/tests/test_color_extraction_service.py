@@ -0,0 +1,67 @@
+"""Tests for image color palette extraction."""
+
+import pytest
+from unittest.mock import MagicMock, patch
+
+from app.services.color_extraction_service import ColorExtractionService
+
+
+REPLY = '{"colors": ["#112233", "#aabbcc"], "color_names": {"#112233": "Navy"}, "description": "Calm"}'
+
+
+@pytest.fixture
+def service():
+    """Create a service whose Anthropic client is mocked."""
+    env = {"AZURE_ENDPOINT": "https://test.openai.azure.com", "API_KEY": "test-key"}
+    with patch.dict("os.environ", env), patch("app.services.color_extraction_service.Anthropic"):
+        svc = ColorExtractionService()
+    svc.client.messages.create.return_value = MagicMock(content=[MagicMock(text=REPLY)])
+    return svc
+
+
+class TestExtractColors:
+    """Tests for extract_colors."""
+
+    def test_repeat_image_served_from_cache(self, service):
+        """Test the same image and media type only reach the model once."""
+        first = service.extract_colors("aW1hZ2U=", "image/png")
+        second = service.extract_colors("aW1hZ2U=", "image/png")
+
+        assert first == second
+        assert first["colors"] == ["#112233", "#AABBCC"]
+        assert service.client.messages.create.call_count == 1
+
+        service.extract_colors("aW1hZ2U=", "image/jpeg")
+        assert service.client.messages.create.call_count == 2
+
+    def test_cached_palette_not_shared_between_callers(self, service):
+        """Test mutating a returned palette does not change later cache hits."""
+        first = service.extract_colors("aW1hZ2U=")
+        first["colors"].append("#000000")
+        first["color_names"].clear()
+
+        second = service.extract_colors("aW1hZ2U=")
+
+        assert second["colors"] == ["#112233", "#AABBCC"]
+        assert second["color_names"] == {"#112233": "Navy"}
+        assert service.client.messages.create.call_count == 1
+
+    def test_failures_not_cached(self, service):
+        """Test an unparseable reply is retried on the next request."""
+        service.client.messages.create.return_value = MagicMock(content=[MagicMock(text="no json here")])
+        assert service.extract_colors("aW1hZ2U=") is None
+
+        service.client.messages.create.return_value = MagicMock(content=[MagicMock(text=REPLY)])
+        assert service.extract_colors("aW1hZ2U=") is not None
+        assert service.client.messages.create.call_count == 2
+
+    @pytest.mark.parametrize("reply", [
+        REPLY,
+        f"```json\n{REPLY}\n```",
+        f"Here is the palette:\n```json\n{REPLY}\n```",
+        f"{REPLY}\nLet me know if you need more.",
+    ])
+    def test_reply_shapes_parsed(self, service, reply):
+        """Test bare, fenced and prose-wrapped JSON replies all parse."""
+        result = service._parse_color_response(reply)
+        assert result["color_names"] == {"#112233": "Navy"}
@@ -0,0 +1,76 @@
+"""Tests for comment length measurement and enforcement."""
+
+import pytest
+
+from app.services.comment_processor import CommentProcessor
+
+
+class TestMarkdownLength:
+    """Tests for measuring slide text without markdown."""
+
+    @pytest.mark.parametrize("text,expected", [
+        ("# Title\n\n- **Bold** point\n- _Second_ point", "Title Bold point Second point"),
+        ("See [the docs](https://x.io) and ![a chart](c.png)", "See the docs and a chart"),
+        ("Before\n```python\ncode()\n```\nAfter", "Before After"),
+        ("   ", ""),
+    ])
+    def test_strip_markdown_for_length(self, text, expected):
+        """Test markdown syntax is removed and whitespace collapsed."""
+        assert CommentProcessor.strip_markdown_for_length(text) == expected
+
+    @pytest.mark.parametrize("text", [
+        "# Title\n\n- **Bold** point\n- _Second_ point",
+        "See [the docs](https://x.io)\n\n\n> quoted ~text~",
+        "",
+        "\n\t \n",
+    ])
+    def test_length_matches_stripped_text(self, text):
+        """Test the length-only measure agrees with the stripped string."""
+        expected = len(CommentProcessor.strip_markdown_for_length(text))
+        assert CommentProcessor.markdown_text_length(text) == expected
+        assert CommentProcessor.measure_slide_text_length(text) == expected
+
+
+class TestEnforceCommentLength:
+    """Tests for comment length enforcement."""
+
+    def test_short_comment_kept(self):
+        """Test a comment within the ratio is returned stripped."""
+        result = CommentProcessor.enforce_comment_length("  Short note.  ", "# A fairly long slide title", "Fallback", 1.0)
+        assert result == "Short note."
+
+    def test_long_comment_uses_fallback(self):
+        """Test an over-long comment is replaced by a fitting fallback."""
+        result = CommentProcessor.enforce_comment_length("word " * 50, "# Ten chars", "Brief.", 1.0)
+        assert result == "Brief."
+
+    def test_short_raw_comment_skips_measuring(self, monkeypatch):
+        """Test a comment whose raw length fits is kept without stripping its markdown."""
+        measured = []
+        original = CommentProcessor.markdown_text_length
+        monkeypatch.setattr(CommentProcessor, "markdown_text_length",
+                            staticmethod(lambda text: measured.append(text) or original(text)))
+
+        result = CommentProcessor.enforce_comment_length("**Note.**", "# A fairly long slide title", "Fallback", 1.0)
+
+        assert result == "**Note.**"
+        assert measured == ["# A fairly long slide title"]
+
+    def test_markup_heavy_comment_measured_without_markup(self):
+        """Test a comment over the raw limit is still kept when its text fits."""
+        result = CommentProcessor.enforce_comment_length("**__Short__**", "# Ten chars", "Fallback", 1.0)
+        assert result == "**__Short__**"
+
+    def test_truncate_keeps_whole_sentences(self):
+        """Test truncation stops at a sentence boundary when one fits."""
+        assert CommentProcessor.truncate_comment("First one. Second sentence here.", 15) == "First one."
+
+    @pytest.mark.parametrize("comment,max_len,expected", [
+        ("One.  Two!\nThree? Four.", 15, "One. Two!"),
+        ("One. Two. Three.", 12, "One. Two."),
+        ("Ends with e.g. an abbreviation", 12, "Ends with"),
+        ("No sentence end here at all", 10, "No"),
+    ])
+    def test_truncate_sentence_boundaries(self, comment, max_len, expected):
+        """Test sentences are rejoined with single spaces and long text falls back to words."""
+        assert CommentProcessor.truncate_comment(comment, max_len) == expected
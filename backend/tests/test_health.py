@@ -1,3 +1,5 @@
+import time
+from unittest.mock import MagicMock, patch
 from fastapi.testclient import TestClient
 from app.main import app
 
@@ -12,3 +14,16 @@ def test_lifespan_logs():
     with TestClient(app) as test_client:
         response = test_client.get("/health")
         assert response.status_code == 200
+
+def test_shutdown_waits_for_warm_up():
+    """Test the shared AI client is closed only after the startup warm-up returns."""
+    ai_client = MagicMock(is_available=True)
+    calls = []
+    ai_client.warm_up.side_effect = lambda: (time.sleep(0.1), calls.append("warm_up"))
+    ai_client.close.side_effect = lambda: calls.append("close")
+
+    with patch("app.main.get_shared_client", return_value=ai_client):
+        with TestClient(app):
+            pass
+
+    assert calls == ["warm_up", "close"]
@@ -1,11 +1,14 @@
 """Tests for layout and presentation transformation features."""
 
 import json
+import httpx
 import pytest
+from anthropic import NotFoundError
 from unittest.mock import MagicMock, patch
 
+from app.services.ai.client import BatchError, BatchNotFoundError
 from app.services.ai.slide_operations import SlideOperations, PresentationTransformer
-from app.services.ai.layout_guide import LAYOUT_CLASSES, get_layout_prompt
+from app.services.ai.layout_guide import LAYOUT_CLASSES, get_all_layouts, get_layout_prompt
 
 
 @pytest.fixture
@@ -54,6 +57,19 @@ class TestLayoutGuide:
         assert isinstance(prompt, str)
         assert len(prompt) > 0
 
+    def test_get_all_layouts_is_read_only(self):
+        """Test the shared layout catalogue cannot be mutated by callers."""
+        layouts = get_all_layouts()
+        assert "columns-2" in layouts["layouts"]
+        assert "flow-horizontal" in layouts["diagrams"]
+        with pytest.raises(TypeError):
+            layouts["layouts"]["new"] = {}
+
+    def test_get_layout_prompt_is_memoized(self):
+        """Test the layout prompt is built once and reused."""
+        assert get_layout_prompt() is get_layout_prompt()
+        assert "`columns-2`" in get_layout_prompt()
+
     @pytest.mark.parametrize("layout_type", [
         "columns-2", "columns-3",
         "columns-2-wide-left", "columns-2-wide-right",
@@ -218,6 +234,16 @@ class TestPresentationTransformer:
 
         assert result == slides  # Original order preserved
 
+    @pytest.mark.parametrize("reply", ["1, 1, 3", "0, 1, 2", "1, 2, 4", "1, 2"])
+    def test_rearrange_rejects_invalid_orders(self, ai_client, mock_anthropic_client, reply):
+        """Test duplicate, out-of-range and partial orders keep the original order."""
+        mock_anthropic_client.messages.create.return_value.content[0].text = reply
+
+        transformer = PresentationTransformer(ai_client)
+        slides = ["# Slide 1", "# Slide 2", "# Slide 3"]
+
+        assert transformer.rearrange(slides) == slides
+
     def test_rearrange_single_slide_unchanged(self, ai_client):
         """Test that single slide is unchanged."""
         transformer = PresentationTransformer(ai_client)
@@ -248,6 +274,79 @@ class TestPresentationTransformer:
 
         assert len(result) == len(slides)
 
+    def test_transform_style_packs_slides_per_request(self, ai_client, mock_anthropic_client):
+        """Test slides are transformed in chunks and split back in order."""
+        def respond(**kwargs):
+            slides = kwargs["messages"][0]["content"].split("===SLIDE===\n")[1:]
+            text = "".join(f"===SLIDE===\n{s.strip()} (story)\n" for s in slides)
+            return MagicMock(content=[MagicMock(text=text)])
+
+        mock_anthropic_client.messages.create.side_effect = respond
+        transformer = PresentationTransformer(ai_client)
+        slides = [f"# Slide {i}" for i in range(7)]
+        result = transformer.transform_style(slides, "story")
+
+        assert result == [f"# Slide {i} (story)" for i in range(7)]
+        assert mock_anthropic_client.messages.create.call_count == 2
+
+    def test_transform_style_sanitizes_each_packed_slide(self, ai_client, mock_anthropic_client):
+        """Test fences and frontmatter around individual packed slides are stripped."""
+        mock_anthropic_client.messages.create.return_value.content[0].text = (
+            "===SLIDE===\n```markdown\n# A\n```\n"
+            "===SLIDE===\n---\nmarp: true\n---\n# B\n"
+        )
+
+        transformer = PresentationTransformer(ai_client)
+        result = transformer.transform_style(["# a", "# b"], "pitch")
+
+        assert result == ["# A", "# B"]
+        assert mock_anthropic_client.messages.create.call_count == 1
+
+    def test_transform_style_retries_mismatched_chunk_per_slide(self, ai_client, mock_anthropic_client):
+        """Test a reply with the wrong slide count falls back to one request per slide."""
+        mock_anthropic_client.messages.create.return_value.content[0].text = "# Merged"
+
+        transformer = PresentationTransformer(ai_client)
+        result = transformer.transform_style(["# A", "# B"], "pitch")
+
+        assert result == ["# Merged", "# Merged"]
+        assert mock_anthropic_client.messages.create.call_count == 3
+
+    def test_transform_style_failure_keeps_originals(self, ai_client, mock_anthropic_client):
+        """Test a failed chunk request leaves its slides unchanged."""
+        mock_anthropic_client.messages.create.side_effect = Exception("API Error")
+
+        transformer = PresentationTransformer(ai_client)
+        slides = ["# A", "# B"]
+        assert transformer.transform_style(slides, "pitch") == slides
+
+    def test_rearrange_and_transform_single_request(self, ai_client, mock_anthropic_client):
+        """Test small decks are reordered and restyled by one JSON reply."""
+        mock_anthropic_client.messages.create.return_value.content[0].text = json.dumps({
+            "order": [2, 1], "slides": ["# Second (pitch)", "# First (pitch)"]
+        })
+
+        transformer = PresentationTransformer(ai_client)
+        result = transformer.rearrange_and_transform(["# First", "# Second"], "pitch")
+
+        assert result == ["# Second (pitch)", "# First (pitch)"]
+        assert mock_anthropic_client.messages.create.call_count == 1
+
+    def test_rearrange_and_transform_falls_back_to_two_steps(self, ai_client, mock_anthropic_client):
+        """Test an invalid combined reply falls back to rearrange then transform."""
+        mock_anthropic_client.messages.create.return_value.content[0].text = json.dumps({
+            "order": [1, 1], "slides": ["# A", "# B"]
+        })
+
+        transformer = PresentationTransformer(ai_client)
+        with patch.object(transformer, "rearrange", return_value=["# 2", "# 1"]) as rearrange, \
+                patch.object(transformer, "transform_style", return_value=["# 2'", "# 1'"]) as transform:
+            result = transformer.rearrange_and_transform(["# 1", "# 2"], "pitch")
+
+        rearrange.assert_called_once_with(["# 1", "# 2"])
+        transform.assert_called_once_with(["# 2", "# 1"], "pitch")
+        assert result == ["# 2'", "# 1'"]
+
     def test_rewrite_for_topic_changes_content(self, ai_client, mock_anthropic_client):
         """Test rewriting for a new topic."""
         mock_anthropic_client.messages.create.return_value.content[0].text = "# Quantum Computing\n- Qubits\n- Superposition"
@@ -259,6 +358,54 @@ class TestPresentationTransformer:
         assert len(result) == 1
         assert "Quantum" in result[0] or "Qubit" in result[0]
 
+    def test_rewrite_for_topic_keeps_slide_order(self, ai_client, mock_anthropic_client):
+        """Test concurrently rewritten slides come back in their original positions."""
+        def respond(**kwargs):
+            position = kwargs["messages"][0]["content"].split("Slide position: ")[1].split("\n")[0]
+            return MagicMock(content=[MagicMock(text=f"# Rewritten {position}")])
+
+        mock_anthropic_client.messages.create.side_effect = respond
+        transformer = PresentationTransformer(ai_client)
+        result = transformer.rewrite_for_topic(["# A", "# B", "# C"], "Space")
+
+        assert result == ["# Rewritten 1 of 3", "# Rewritten 2 of 3", "# Rewritten 3 of 3"]
+
+    def test_topic_rewrite_batch_round_trip(self, ai_client, mock_anthropic_client):
+        """Test batch rewrites submit one request per slide and merge results in order."""
+        batches = mock_anthropic_client.messages.batches
+        batches.create.return_value.id = "batch_1"
+        assert PresentationTransformer(ai_client).submit_topic_rewrite(["# A", "# B"], "Space") == "batch_1"
+        requests = batches.create.call_args.kwargs["requests"]
+        assert [r["custom_id"] for r in requests] == ["0", "1"]
+
+        batches.retrieve.return_value.processing_status = "in_progress"
+        transformer = PresentationTransformer(ai_client)
+        assert transformer.collect_topic_rewrite("batch_1", ["# A", "# B"]) is None
+
+        batches.retrieve.return_value.processing_status = "ended"
+        succeeded = MagicMock(custom_id="1")
+        succeeded.result.type = "succeeded"
+        succeeded.result.message.content = [MagicMock(text="# Space B")]
+        errored = MagicMock(custom_id="0")
+        errored.result.type = "errored"
+        batches.results.return_value = iter([succeeded, errored])
+
+        assert transformer.collect_topic_rewrite("batch_1", ["# A", "# B"]) == ["# A", "# Space B"]
+
+    def test_topic_rewrite_batch_errors_are_distinct(self, ai_client, mock_anthropic_client):
+        """Test an unknown batch id and a failed lookup raise instead of reading as pending."""
+        batches = mock_anthropic_client.messages.batches
+        response = httpx.Response(404, request=httpx.Request("GET", "https://test"))
+        batches.retrieve.side_effect = NotFoundError("missing", response=response, body=None)
+        transformer = PresentationTransformer(ai_client)
+
+        with pytest.raises(BatchNotFoundError):
+            transformer.collect_topic_rewrite("nope", ["# A"])
+
+        batches.retrieve.side_effect = ConnectionError("down")
+        with pytest.raises(BatchError):
+            transformer.collect_topic_rewrite("batch_1", ["# A"])
+
     def test_rewrite_keeps_style_flag(self, ai_client, mock_anthropic_client):
         """Test that keep_style parameter works."""
         mock_anthropic_client.messages.create.return_value.content[0].text = "# New Topic"